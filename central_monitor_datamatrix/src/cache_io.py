@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+import itertools
 import os
 import random
 import threading
@@ -8,50 +8,160 @@ import time
 from pathlib import Path
 from typing import Any
 
+import orjson
 
-def acquire_lock(lock_path: Path, timeout_sec: float = 5.0, poll: float = 0.05) -> int:
-    """Acquire an exclusive lock file via O_CREAT|O_EXCL and return its file descriptor."""
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Private generator for retry jitter, independent of the global random state.
+_RNG = random.Random()
+# Tmp names are "<name>.tmp.<pid>.<n>": the pid separates writer processes and a
+# process-wide counter (atomic under the GIL) separates threads and attempts.
+_TMP_COUNTER = itertools.count()
+_TMP_PID = os.getpid()
+# O_BINARY only exists (and matters) on Windows.
+_TMP_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+_KNOWN_DIRS: set[Path] = set()
+# Bounded so a hung lock holder (e.g. a stuck reader on Windows) surfaces as TimeoutError,
+# which the cache writers retry and report, instead of freezing the writer.
+WRITE_LOCK_TIMEOUT_SEC = 5.0
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def acquire_lock(lock_path: Path, timeout_sec: float | None = 5.0, poll: float = 0.05) -> int:
+    """Take an OS advisory lock on lock_path and return its file descriptor.
+
+    The lock dies with the holding process, so there is no stale lock file to clean up.
+    With timeout_sec=None the wait blocks in the kernel (POSIX flock) instead of polling.
+    """
     lock_path = Path(lock_path)
-    deadline = time.monotonic() + timeout_sec
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        if timeout_sec is None and fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        elif not _try_lock(fd):
+            deadline = None if timeout_sec is None else time.monotonic() + timeout_sec
+            delay = 0.001
+            while not _try_lock(fd):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"timed out waiting for lock file: {lock_path}")
+                time.sleep(delay)
+                delay = min(max(0.001, poll), delay * 2)
+        payload = f"pid={os.getpid()} tid={threading.get_ident()} ts={time.time():.6f}\n"
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, payload.encode("utf-8"))
+        return fd
+    except BaseException:
+        os.close(fd)
+        raise
 
-    while True:
-        try:
-            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-            payload = f"pid={os.getpid()} tid={threading.get_ident()} ts={time.time():.6f}\n"
-            os.write(fd, payload.encode("utf-8"))
-            return fd
-        except FileExistsError:
-            if time.monotonic() >= deadline:
-                raise TimeoutError(f"timed out waiting for lock file: {lock_path}")
-            time.sleep(max(0.001, poll))
 
+def release_lock(lock_fd: int) -> None:
+    """Release a lock taken by acquire_lock and close its descriptor.
 
-def _release_lock(lock_path: Path, lock_fd: int) -> None:
+    The lock file itself is left in place: unlinking it would let a new opener lock a fresh
+    inode while a waiter still holds the old one.
+    """
     try:
-        os.close(lock_fd)
+        if fcntl is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(lock_fd, 0, os.SEEK_SET)
+            msvcrt.locking(lock_fd, msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
     finally:
-        Path(lock_path).unlink(missing_ok=True)
+        os.close(lock_fd)
 
 
-def atomic_write_json(path: Path, obj: Any, retries: int = 20) -> None:
-    path = Path(path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    text = json.dumps(obj, ensure_ascii=False, indent=2)
+def ensure_dir(directory: Path) -> None:
+    """mkdir -p, skipped for directories this process has already created or seen."""
+    if directory in _KNOWN_DIRS:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    _KNOWN_DIRS.add(directory)
 
+
+def _lock_for_write(path: Path) -> int:
+    """Lock <path>.lock; if path's directory was removed after ensure_dir saw it, re-create it once."""
     lock_path = path.with_name(f"{path.name}.lock")
-    lock_fd = acquire_lock(lock_path)
+    try:
+        return acquire_lock(lock_path, timeout_sec=WRITE_LOCK_TIMEOUT_SEC)
+    except FileNotFoundError:
+        _KNOWN_DIRS.discard(path.parent)
+        ensure_dir(path.parent)
+        return acquire_lock(lock_path, timeout_sec=WRITE_LOCK_TIMEOUT_SEC)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def dumps_json(obj: Any, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes; compact unless pretty (2-space indent) is requested."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+def loads_json(data: bytes) -> Any:
+    """Parse JSON bytes; raises json.JSONDecodeError subclasses on bad input."""
+    return orjson.loads(data)
+
+
+def load_json(path: Path) -> Any:
+    """Read and parse a JSON file in one read."""
+    return loads_json(Path(path).read_bytes())
+
+
+def dumps_json_object(fields: dict[str, Any], fragments: dict[str, bytes]) -> bytes:
+    """Compact JSON object from plain fields followed by members that are already serialized."""
+    head = dumps_json(fields)[:-1]
+    if not fragments:
+        return head + b"}"
+    members = b",".join(dumps_json(key) + b":" + raw for key, raw in fragments.items())
+    return head + (b"," if fields else b"") + members + b"}"
+
+
+def atomic_write_json(
+    path: Path, obj: Any, retries: int = 20, fsync: bool = True, pretty: bool = True
+) -> None:
+    atomic_write_bytes(path, dumps_json(obj, pretty=pretty), retries=retries, fsync=fsync)
+
+
+def atomic_write_bytes(path: Path, data: bytes, retries: int = 20, fsync: bool = True) -> None:
+    path = Path(path)
+    ensure_dir(path.parent)
+
+    lock_fd = _lock_for_write(path)
     try:
         last_exc: PermissionError | None = None
         for attempt in range(1, retries + 1):
-            token = random.getrandbits(32)
-            tmp_path = path.with_name(
-                f"{path.name}.tmp.{os.getpid()}.{threading.get_ident()}.{token:08x}"
-            )
+            tmp_path = path.with_name(f"{path.name}.tmp.{_TMP_PID}.{next(_TMP_COUNTER)}")
             try:
-                with tmp_path.open("w", encoding="utf-8") as handle:
-                    handle.write(text)
-                    handle.flush()
-                    os.fsync(handle.fileno())
+                fd = os.open(tmp_path, _TMP_OPEN_FLAGS, 0o644)
+                try:
+                    _write_all(fd, data)
+                    if fsync:
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
                 os.replace(tmp_path, path)
                 return
             except PermissionError as exc:
@@ -60,30 +170,37 @@ def atomic_write_json(path: Path, obj: Any, retries: int = 20) -> None:
                 if attempt >= retries:
                     break
                 delay = min(0.8, 0.01 * (2 ** (attempt - 1)))
-                delay += random.uniform(0.0, 0.01)
+                delay += _RNG.uniform(0.0, 0.01)
                 time.sleep(delay)
             except Exception:
                 tmp_path.unlink(missing_ok=True)
+                # The directory may have been removed underneath us; re-create it next time.
+                _KNOWN_DIRS.discard(path.parent)
                 raise
 
         if last_exc is not None:
             raise last_exc
         raise RuntimeError(f"atomic write failed: {path}")
     finally:
-        _release_lock(lock_path, lock_fd)
+        release_lock(lock_fd)
 
 
 def atomic_append_jsonl(path: Path, obj: Any) -> None:
     path = Path(path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    line = json.dumps(obj, ensure_ascii=False) + "\n"
+    ensure_dir(path.parent)
+    line = dumps_json(obj) + b"\n"
 
-    lock_path = path.with_name(f"{path.name}.lock")
-    lock_fd = acquire_lock(lock_path)
+    lock_fd = _lock_for_write(path)
     try:
-        with path.open("a", encoding="utf-8") as handle:
+        try:
+            handle = path.open("ab")
+        except FileNotFoundError:
+            _KNOWN_DIRS.discard(path.parent)
+            ensure_dir(path.parent)
+            handle = path.open("ab")
+        with handle:
             handle.write(line)
             handle.flush()
             os.fsync(handle.fileno())
     finally:
-        _release_lock(lock_path, lock_fd)
+        release_lock(lock_fd)
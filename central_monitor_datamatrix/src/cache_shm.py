@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+# Segment layout: <seq:u64><length:u32><generation:u64><payload>. The writer makes seq odd while
+# it copies the payload and even again when done, so a reader that sees the same even seq before
+# and after its copy has a consistent snapshot (a seqlock; there is a single writer per segment).
+# generation identifies the writer that created the segment, and length _CLOSED marks a segment
+# its writer has closed, so readers can tell when the name now refers to a new segment.
+_HEADER = struct.Struct("<QI")
+_GENERATION = struct.Struct("<Q")
+_PAYLOAD_OFFSET = _HEADER.size + _GENERATION.size
+_CLOSED = 0xFFFFFFFF
+DEFAULT_SHM_SIZE = 1 << 20
+READ_RETRIES = 50
+# Unchanged reads after which a reader checks that the name still refers to its segment.
+STALE_CHECK_READS = 5
+
+
+class ShmCacheClosed(Exception):
+    """The segment a reader is attached to was closed or replaced by its writer."""
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name != "nt":
+        # Before Python 3.13 attaching registers the segment with this process's resource
+        # tracker, which would unlink it under the writer when the reader exits.
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class ShmCacheWriter:
+    """Publish cache snapshots into a named shared memory segment owned by this process."""
+
+    def __init__(self, name: str, size: int = DEFAULT_SHM_SIZE) -> None:
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that did not exit cleanly; there is only one writer per name.
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = name
+        self._buf = self._shm.buf
+        self._capacity = len(self._buf) - _PAYLOAD_OFFSET
+        # Start from the clock rather than 0 so a restarted writer never repeats a seq a
+        # reader may have already seen.
+        generation = time.time_ns()
+        self._seq = generation & ~1
+        _HEADER.pack_into(self._buf, 0, self._seq, 0)
+        _GENERATION.pack_into(self._buf, _HEADER.size, generation)
+
+    def publish(self, data: bytes) -> bool:
+        """Copy data into the segment; returns False (and publishes nothing) if it does not fit."""
+        size = len(data)
+        if size > self._capacity:
+            return False
+        buf = self._buf
+        self._seq += 1
+        _HEADER.pack_into(buf, 0, self._seq, size)
+        buf[_PAYLOAD_OFFSET : _PAYLOAD_OFFSET + size] = data
+        self._seq += 1
+        _HEADER.pack_into(buf, 0, self._seq, size)
+        return True
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        # Tell readers still mapped to this segment to reattach; the name is about to go away.
+        self._seq += 2
+        _HEADER.pack_into(self._buf, 0, self._seq, _CLOSED)
+        self._buf = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+
+class ShmCacheReader:
+    """Read snapshots published by ShmCacheWriter, skipping the copy when nothing changed."""
+
+    def __init__(self, name: str) -> None:
+        # Raises FileNotFoundError until the writer has created the segment.
+        self._shm = _attach(name)
+        if _HEADER.unpack_from(self._shm.buf, 0)[1] == _CLOSED:
+            # A closing writer's segment that is not unlinked yet.
+            self._shm.close()
+            raise FileNotFoundError(f"shared memory cache {name} is closed")
+        self.name = name
+        self.last_seq = 0
+        self._generation = _GENERATION.unpack_from(self._shm.buf, _HEADER.size)[0]
+        self._unchanged_reads = 0
+
+    def read(self) -> bytes | None:
+        """Latest payload, or None when it is unchanged since the previous read or still empty.
+
+        Raises ShmCacheClosed once the writer has closed the segment or the name refers to a
+        new one (a restarted writer); the reader should then be closed and reattached.
+        """
+        buf = self._shm.buf
+        for _ in range(READ_RETRIES):
+            seq, size = _HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if size == _CLOSED:
+                raise ShmCacheClosed(f"shared memory cache {self.name} was closed by its writer")
+            if seq == self.last_seq or size == 0:
+                self._unchanged_reads += 1
+                if self._unchanged_reads >= STALE_CHECK_READS:
+                    self._unchanged_reads = 0
+                    self._check_attached()
+                return None
+            data = bytes(buf[_PAYLOAD_OFFSET : _PAYLOAD_OFFSET + size])
+            if _HEADER.unpack_from(buf, 0)[0] == seq:
+                self.last_seq = seq
+                self._unchanged_reads = 0
+                return data
+        raise TimeoutError(f"shared memory cache {self.name} kept changing during read")
+
+    def _check_attached(self) -> None:
+        # A writer that died without close() leaves no marker, but its segment is unlinked
+        # (by the resource tracker) and a restarted writer creates a new one under the name.
+        try:
+            current = _attach(self.name)
+        except FileNotFoundError:
+            raise ShmCacheClosed(f"shared memory cache {self.name} no longer exists") from None
+        try:
+            generation = _GENERATION.unpack_from(current.buf, _HEADER.size)[0]
+        finally:
+            current.close()
+        if generation != self._generation:
+            raise ShmCacheClosed(f"shared memory cache {self.name} was replaced by a new writer")
+
+    def close(self) -> None:
+        self._shm.close()
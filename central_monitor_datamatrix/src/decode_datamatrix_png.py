@@ -6,10 +6,6 @@ import logging
 import sys
 from pathlib import Path
 
-import cv2
-
-import dm_datamatrix
-
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +19,10 @@ def parse_args() -> argparse.Namespace:
 def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     args = parse_args()
+    # Imported after argument parsing so --help and usage errors skip OpenCV start-up.
+    import cv2
+
+    import dm_datamatrix
 
     image_path = Path(args.image)
     image = cv2.imread(str(image_path))
@@ -1,19 +1,35 @@
 from __future__ import annotations
 
+import functools
 import json
+import logging
 import os
 import subprocess
-import tempfile
+import threading
 import time
 from pathlib import Path
 from typing import Any
 
+from PIL import Image
+
+import cache_io
 import dm_codec
 import dm_payload
 
+try:
+    import zint
+except Exception:  # pragma: no cover - zint.exe is used instead
+    zint = None
+
+logger = logging.getLogger(__name__)
+
 BARCODE_TYPE_DATAMATRIX = "71"
+ZINT_SCALE = 4
+
+_TLS = threading.local()
 
 
+@functools.lru_cache(maxsize=1)
 def resolve_zint_exe() -> Path:
     script_dir = Path(__file__).resolve().parent
     repo_root = script_dir.parent
@@ -31,19 +47,114 @@ def build_blob_from_cache(cache: dict[str, Any], beds_count: int = 6) -> tuple[b
     return blob, packet_bytes
 
 
+def _replace_with_retry(src: Path, dst: Path, attempts: int = 3) -> None:
+    for attempt in range(1, attempts + 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == attempts:
+                raise
+            time.sleep(0.05 * attempt)
+
+
+def _datamatrix_symbol() -> "zint.Symbol":
+    """This thread's configured DataMatrix symbol, cleared for the next encode."""
+    symbol = getattr(_TLS, "symbol", None)
+    if symbol is not None:
+        symbol.clear()
+        return symbol
+    symbol = _TLS.symbol = zint.Symbol()
+    symbol.symbology = zint.Symbology.DATAMATRIX
+    symbol.input_mode = zint.InputMode.DATA
+    symbol.option_3 = zint.DataMatrixOptions.SQUARE
+    symbol.output_options = zint.OutputOptions.BARCODE_QUIET_ZONES
+    # One pixel per module (raster output is 2px per module at scale 1.0); the upscale to
+    # ZINT_SCALE happens on the 1-bit image, which is far cheaper than zint's PNG writer.
+    symbol.scale = 0.5
+    return symbol
+
+
+def _optimize_png(path: Path) -> None:
+    """Recompress an existing PNG in place with Pillow's smallest lossless settings."""
+    with Image.open(path) as image:
+        image.load()
+    tmp_png = path.with_name(f"{path.name}.tmp.{os.getpid()}.{time.time_ns()}.png")
+    try:
+        image.save(tmp_png, format="PNG", optimize=True)
+        _replace_with_retry(tmp_png, path)
+    finally:
+        tmp_png.unlink(missing_ok=True)
+
+
+def _generate_datamatrix_png_inprocess(
+    blob: bytes, out_path: Path, optimize: bool = False
+) -> subprocess.CompletedProcess[str]:
+    """Same image as the zint.exe command line below, encoded through libzint in-process."""
+    args = ["zint-bindings", "-b", BARCODE_TYPE_DATAMATRIX, f"--scale={ZINT_SCALE}", "-o", str(out_path)]
+    try:
+        symbol = _datamatrix_symbol()
+        symbol.encode(blob)
+        symbol.buffer()
+        bitmap = symbol.bitmap
+        rows, cols = bitmap.shape[:2]
+        image = Image.frombytes("RGB", (cols, rows), bitmap.tobytes()).convert("1", dither=Image.NONE)
+        module_px = int(ZINT_SCALE * 2)
+        image = image.resize((cols * module_px, rows * module_px), resample=Image.NEAREST)
+    except Exception as exc:
+        return subprocess.CompletedProcess(args, 1, stdout="", stderr=str(exc))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_png = out_path.with_name(f"{out_path.name}.tmp.{os.getpid()}.{time.time_ns()}.png")
+    try:
+        # optimize=True is zlib level 9 plus filter search: smaller file, slower save.
+        image.save(tmp_png, format="PNG", optimize=optimize)
+        _replace_with_retry(tmp_png, out_path)
+    finally:
+        tmp_png.unlink(missing_ok=True)
+    return subprocess.CompletedProcess(args, 0, stdout="", stderr="")
+
+
 def generate_datamatrix_png(
     blob: bytes,
     out_path: Path,
     zint_exe: Path | None = None,
     timeout_sec: float = 3.0,
+    optimize: bool = False,
 ) -> subprocess.CompletedProcess[str]:
+    """Write the DataMatrix PNG for blob.
+
+    Uses zint-bindings in-process when available and no zint_exe is given; otherwise runs
+    zint.exe with the blob on stdin. optimize trades save time for a smaller file and is
+    meant for PNGs that are kept or shipped, not for per-tick previews.
+    """
+    if zint_exe is None and zint is not None:
+        result = _generate_datamatrix_png_inprocess(blob, out_path, optimize=optimize)
+        if result.returncode == 0:
+            return result
+        try:
+            zint_exe = resolve_zint_exe()
+        except FileNotFoundError:
+            return result
+        logger.warning("in-process zint failed (%s); falling back to %s", result.stderr, zint_exe)
+
     zint_exe = zint_exe or resolve_zint_exe()
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    result = _run_zint_exe(blob, out_path, zint_exe, timeout_sec)
+    if optimize and result.returncode == 0:
+        _optimize_png(out_path)
+    return result
+
 
-    with tempfile.NamedTemporaryFile("wb", delete=False, suffix=".bin") as tf:
-        tf.write(blob)
-        bin_file = Path(tf.name)
+def _decode_output(output: bytes | str | None) -> str:
+    if isinstance(output, bytes):
+        return output.decode(errors="replace")
+    return output or ""
 
+
+def _run_zint_exe(
+    blob: bytes, out_path: Path, zint_exe: Path, timeout_sec: float
+) -> subprocess.CompletedProcess[str]:
     tmp_png = out_path.with_name(f"{out_path.name}.tmp.{os.getpid()}.{time.time_ns()}.png")
 
     try:
@@ -53,37 +164,31 @@ def generate_datamatrix_png(
             BARCODE_TYPE_DATAMATRIX,
             "--binary",
             "-i",
-            str(bin_file),
+            "-",
             "--filetype=PNG",
             "--quiet",
             "--square",
             "--quietzones",
-            "--scale=4",
+            f"--scale={ZINT_SCALE}",
             "-o",
             str(tmp_png),
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout_sec)
-        if result.returncode == 0:
-            replace_attempts = 3
-            for attempt in range(1, replace_attempts + 1):
-                try:
-                    os.replace(tmp_png, out_path)
-                    break
-                except PermissionError:
-                    if attempt == replace_attempts:
-                        raise
-                    time.sleep(0.05 * attempt)
-        return result
+        # The blob goes through a pipe (binary, no newline translation), not a temp file.
+        raw = subprocess.run(cmd, input=blob, capture_output=True, timeout=timeout_sec)
+        if raw.returncode == 0:
+            _replace_with_retry(tmp_png, out_path)
+        return subprocess.CompletedProcess(
+            cmd, raw.returncode, stdout=_decode_output(raw.stdout), stderr=_decode_output(raw.stderr)
+        )
     except subprocess.TimeoutExpired as exc:
         tmp_png.unlink(missing_ok=True)
         raise RuntimeError(
             "zint.exe timed out "
             f"(timeout_sec={timeout_sec})\n"
-            f"stdout:\n{exc.stdout or ''}\n"
-            f"stderr:\n{exc.stderr or ''}"
+            f"stdout:\n{_decode_output(exc.stdout)}\n"
+            f"stderr:\n{_decode_output(exc.stderr)}"
         ) from exc
     finally:
-        bin_file.unlink(missing_ok=True)
         tmp_png.unlink(missing_ok=True)
 
 
@@ -91,8 +196,7 @@ def load_cache_with_retry(cache_path: Path, retries: int = 3, retry_delay_sec: f
     last_exc: Exception | None = None
     for attempt in range(1, retries + 1):
         try:
-            with cache_path.open("r", encoding="utf-8") as f:
-                return json.load(f), attempt
+            return cache_io.load_json(cache_path), attempt
         except (json.JSONDecodeError, OSError) as exc:
             last_exc = exc
             if attempt < retries:
@@ -101,26 +205,41 @@ def load_cache_with_retry(cache_path: Path, retries: int = 3, retry_delay_sec: f
     raise last_exc
 
 
-def generate_datamatrix_png_from_cache(cache_path: Path, out_path: Path, beds_count: int = 6) -> tuple[dict[str, int], int]:
+def generate_datamatrix_png_from_cache(
+    cache_path: Path,
+    out_path: Path,
+    beds_count: int = 6,
+    optimize: bool = False,
+    zint_exe: Path | None = None,
+) -> tuple[dict[str, int], int]:
     cache, attempt = load_cache_with_retry(cache_path)
 
-    return generate_datamatrix_png_from_cache_data(cache, out_path, beds_count=beds_count), attempt
+    sizes = generate_datamatrix_png_from_cache_data(
+        cache, out_path, beds_count=beds_count, optimize=optimize, zint_exe=zint_exe
+    )
+    return sizes, attempt
 
 
-def generate_datamatrix_png_from_cache_data(cache: dict[str, Any], out_path: Path, beds_count: int = 6) -> dict[str, int]:
+def generate_datamatrix_png_from_cache_data(
+    cache: dict[str, Any],
+    out_path: Path,
+    beds_count: int = 6,
+    optimize: bool = False,
+    zint_exe: Path | None = None,
+) -> dict[str, int]:
 
     blob, packet_bytes = build_blob_from_cache(cache, beds_count=beds_count)
-    result = generate_datamatrix_png(blob, out_path)
+    result = generate_datamatrix_png(blob, out_path, zint_exe=zint_exe, optimize=optimize)
     if result.returncode != 0:
         raise RuntimeError(
-            "zint.exe failed "
+            f"{result.args[0]} failed "
             f"(returncode={result.returncode})\n"
             f"stdout:\n{result.stdout}\n"
             f"stderr:\n{result.stderr}"
         )
 
     if not out_path.exists() or out_path.stat().st_size <= 0:
-        raise RuntimeError("zint.exe completed but output PNG is missing or empty")
+        raise RuntimeError("zint completed but output PNG is missing or empty")
 
     return {"blob_size": len(blob), "packet_size": len(packet_bytes)}
 
@@ -10,10 +10,13 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
-from PIL import Image, ImageTk
+from PIL import Image
 from screeninfo import get_monitors
 
+import cache_io
+import cache_shm
 import dm_datamatrix
+from dm_render import to_pnm_bytes
 import paths as run_paths
 
 logger = logging.getLogger(__name__)
@@ -134,6 +137,8 @@ class DMDisplayApp:
         self.image_label.pack(fill=tk.BOTH, expand=True)
         self.photo = None
         self.cache_path: Path | None = None
+        self.cache_shm_name: str | None = None
+        self._shm_reader: cache_shm.ShmCacheReader | None = None
         self.last_seen_packet_id: int | None = None
         self.warned_missing_packet_id = False
         self.no_update_count = 0
@@ -143,14 +148,40 @@ class DMDisplayApp:
     def set_cache_path(self, cache_path: Path) -> None:
         self.cache_path = cache_path
 
+    def set_cache_shm(self, name: str | None) -> None:
+        self.cache_shm_name = name
+
+    def _read_cache(self) -> tuple[dict[str, Any] | None, int]:
+        """Latest cache and read attempts; None when shared memory reports no new snapshot."""
+        if self.cache_shm_name is not None and self._shm_reader is None:
+            try:
+                self._shm_reader = cache_shm.ShmCacheReader(self.cache_shm_name)
+                logger.info("attached to shared memory cache: %s", self.cache_shm_name)
+            except FileNotFoundError:
+                if self.debug:
+                    logger.info("debug: shared memory cache not found yet; reading file: %s", self.cache_shm_name)
+        if self._shm_reader is not None:
+            try:
+                data = self._shm_reader.read()
+                return (cache_io.loads_json(data) if data is not None else None), 1
+            except cache_shm.ShmCacheClosed as exc:
+                logger.warning("%s; reading %s until it is published again", exc, self.cache_path)
+                self._shm_reader.close()
+                self._shm_reader = None
+        return dm_datamatrix.load_cache_with_retry(self.cache_path)
+
     def _refresh_png_if_cache_updated(self) -> None:
         if self.cache_path is None:
             return
 
         try:
             self.tick_count += 1
-            cache, read_attempt = dm_datamatrix.load_cache_with_retry(self.cache_path)
+            cache, read_attempt = self._read_cache()
             self.read_failures = 0
+            if cache is None:
+                # Shared memory seq unchanged: same snapshot as last tick, nothing to parse.
+                self.no_update_count += 1
+                return
 
             fallback_epoch_ms = int(time.time() * 1000)
             cache = _ensure_cache_metadata(cache, fallback_epoch_ms=fallback_epoch_ms)
@@ -218,8 +249,13 @@ class DMDisplayApp:
             with Image.open(self.out_path) as image:
                 image.load()
                 resized_image = image.resize((WINDOW_WIDTH, WINDOW_HEIGHT), Image.NEAREST)
-                self.photo = ImageTk.PhotoImage(resized_image)
-            self.image_label.configure(image=self.photo)
+                pnm = to_pnm_bytes(resized_image)
+            if self.photo is None:
+                self.photo = tk.PhotoImage(data=pnm, format="PPM")
+                self.image_label.configure(image=self.photo)
+            else:
+                # Reload pixels into the existing Tk image instead of allocating a new one per tick.
+                self.photo.configure(data=pnm, format="PPM")
         except FileNotFoundError:
             logger.warning("output image not found: %s", self.out_path)
         except Exception as exc:
@@ -245,6 +281,11 @@ def parse_args() -> argparse.Namespace:
         default=CacheUpdateMode.GENERATOR,
         help="Cache update strategy: generator=packet_id+epoch_ms, receiver=mtime/epoch_ms fallback",
     )
+    parser.add_argument(
+        "--cache-shm",
+        default=None,
+        help="Read snapshots from this shared memory name (writer --cache-shm); --cache is used until it exists",
+    )
     parser.add_argument("--work-root", default=None, help="Working root. Default: C:/Users/sakai/HL7_DM_test")
     parser.add_argument("--run-dir", help="Output directory. Default: dataset/YYYYMMDD")
     parser.add_argument("--out", default=None, help="Output PNG path (relative path is resolved under --run-dir)")
@@ -311,6 +352,7 @@ def main() -> int:
         debug=args.debug,
     )
     app.set_cache_path(run_paths.resolve_work_path(args.cache, work_root))
+    app.set_cache_shm(args.cache_shm)
     app.run()
     return 0
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import struct
+import time
 from datetime import datetime, timezone
 from typing import Any
 
@@ -35,8 +36,19 @@ SCALE_MAP: dict[str, int] = {
     "TRECT": 10,
 }
 
+_PARAMS_20_SCALES = [SCALE_MAP.get(param, 1) for param in PARAMS_20]
+
 _HEADER_STRUCT = struct.Struct("<4sBBBBqi")
 _CELL_STRUCT = struct.Struct("<Bi")
+_ABSENT_CELL = (0, 0)
+
+
+def _row_struct(params_count: int) -> struct.Struct:
+    # bed_present(uint8) followed by params_count x (present(uint8), value(int32)).
+    return struct.Struct("<B" + "Bi" * params_count)
+
+
+_PARAMS_20_ROW_STRUCT = _row_struct(len(PARAMS_20))
 _ALLOWED_VITAL_FIELDS = ("value", "unit", "flag", "status")
 schema_version = VERSION
 
@@ -54,21 +66,23 @@ class SeqCounter:
         return self._value
 
 
-
-
 def _epoch_ms_to_iso(epoch_ms: int) -> str:
     return datetime.fromtimestamp(epoch_ms / 1000.0, tz=timezone.utc).isoformat(timespec="milliseconds")
 
 
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
 def _to_epoch_ms(value: Any) -> int:
     if value is None:
-        return int(datetime.now(timezone.utc).timestamp() * 1000)
+        return _now_ms()
     if isinstance(value, (int, float)):
         return int(value)
     if isinstance(value, str):
         text = value.strip()
         if not text:
-            return int(datetime.now(timezone.utc).timestamp() * 1000)
+            return _now_ms()
         try:
             dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
             if dt.tzinfo is None:
@@ -79,8 +93,8 @@ def _to_epoch_ms(value: Any) -> int:
         try:
             return int(float(text))
         except ValueError:
-            return int(datetime.now(timezone.utc).timestamp() * 1000)
-    return int(datetime.now(timezone.utc).timestamp() * 1000)
+            return _now_ms()
+    return _now_ms()
 
 
 def _to_float(value: Any) -> float | None:
@@ -132,18 +146,39 @@ def _sanitize_vitals(vitals: dict[str, Any], allowed_params: set[str] | None = N
     return result
 
 
-def make_payload(monitor_cache: dict[str, Any], seq: int) -> dict[str, Any]:
+def make_payload(
+    monitor_cache: dict[str, Any],
+    seq: int,
+    bed_cache: dict[str, tuple[str, dict[str, Any] | None]] | None = None,
+) -> dict[str, Any]:
+    # bed_cache maps bed_id -> (bed ts, sanitized entry) across calls: beds whose ts is unchanged
+    # reuse the previous entry instead of being re-sanitized. Callers must not mutate the result.
     beds: dict[str, Any] = {}
     allowed = set(PARAMS_20)
-    for bed_id, bed_data in (monitor_cache.get("beds") or {}).items():
+    cache_beds = monitor_cache.get("beds") or {}
+    for bed_id, bed_data in cache_beds.items():
         if not isinstance(bed_data, dict):
             continue
+        bed_key = str(bed_id)
+        bed_ts = bed_data.get("ts")
+        if bed_cache is not None and isinstance(bed_ts, str):
+            cached = bed_cache.get(bed_key)
+            if cached is not None and cached[0] == bed_ts:
+                if cached[1] is not None:
+                    beds[bed_key] = cached[1]
+                continue
+        entry = None
         vitals_raw = bed_data.get("vitals")
-        if not isinstance(vitals_raw, dict):
-            continue
-        vitals = _sanitize_vitals(vitals_raw, allowed_params=allowed)
-        if vitals:
-            beds[str(bed_id)] = {"vitals": vitals}
+        if isinstance(vitals_raw, dict):
+            vitals = _sanitize_vitals(vitals_raw, allowed_params=allowed)
+            if vitals:
+                entry = {"vitals": vitals}
+                beds[bed_key] = entry
+        if bed_cache is not None and isinstance(bed_ts, str):
+            bed_cache[bed_key] = (bed_ts, entry)
+    if bed_cache is not None and len(bed_cache) > len(cache_beds):
+        for stale in [key for key in bed_cache if key not in cache_beds]:
+            del bed_cache[stale]
 
     epoch_ms = _to_epoch_ms(monitor_cache.get("epoch_ms") or monitor_cache.get("ts") or monitor_cache.get("timestamp"))
 
@@ -167,14 +202,6 @@ def make_payload(monitor_cache: dict[str, Any], seq: int) -> dict[str, Any]:
     }
 
 
-def _quantize(param: str, value: Any) -> tuple[int, int]:
-    numeric = _to_float(value)
-    if numeric is None:
-        return 0, 0
-    scale = SCALE_MAP.get(param, 1)
-    return 1, int(round(numeric * scale))
-
-
 def _dequantize(param: str, present: int, raw_value: int) -> dict[str, Any]:
     if present == 0:
         return {"present": 0, "value": None}
@@ -196,26 +223,41 @@ def build_packet(monitor_cache: dict[str, Any], beds: list[str] | None = None, p
         packet_id = int(packet_id_raw)
     except (TypeError, ValueError):
         packet_id = 0
-    header = _HEADER_STRUCT.pack(MAGIC, VERSION, len(beds), len(params), 0, timestamp_ms, packet_id)
+    if params is PARAMS_20:
+        param_scales = _PARAMS_20_SCALES
+        row_struct = _PARAMS_20_ROW_STRUCT
+    else:
+        param_scales = [SCALE_MAP.get(param, 1) for param in params]
+        row_struct = _row_struct(len(params))
+    packet = bytearray(_HEADER_STRUCT.size + len(beds) * row_struct.size)
+    _HEADER_STRUCT.pack_into(packet, 0, MAGIC, VERSION, len(beds), len(params), 0, timestamp_ms, packet_id)
 
-    body = bytearray()
+    offset = _HEADER_STRUCT.size
     cache_beds = monitor_cache.get("beds") if isinstance(monitor_cache.get("beds"), dict) else {}
+    if not cache_beds:
+        # Startup/idle state: the zero-filled body already encodes every bed as absent.
+        return bytes(packet)
 
     for bed_id in beds:
         bed_data = cache_beds.get(bed_id)
-        bed_present = 1 if isinstance(bed_data, dict) else 0
-        body.append(bed_present)
-
-        vitals = bed_data.get("vitals") if isinstance(bed_data, dict) else {}
-        vitals = vitals if isinstance(vitals, dict) else {}
-
-        for param in params:
-            vital = vitals.get(param)
-            value = vital.get("value") if isinstance(vital, dict) else vital
-            present, quantized = _quantize(param, value)
-            body.extend(_CELL_STRUCT.pack(present, quantized if present else 0))
-
-    return header + bytes(body)
+        # Absent beds stay as the zero-filled default (bed_present=0, every cell present=0).
+        if isinstance(bed_data, dict):
+            vitals = bed_data.get("vitals")
+            vitals = vitals if isinstance(vitals, dict) else {}
+
+            row: list[int] = [1]
+            for param, scale in zip(params, param_scales):
+                vital = vitals.get(param)
+                value = vital.get("value") if isinstance(vital, dict) else vital
+                numeric = _to_float(value)
+                if numeric is None:
+                    row.extend(_ABSENT_CELL)
+                else:
+                    row.extend((1, int(round(numeric * scale))))
+            row_struct.pack_into(packet, offset, *row)
+        offset += row_struct.size
+
+    return bytes(packet)
 
 
 def parse_packet(packet_bytes: bytes, beds: list[str] | None = None, params: list[str] | None = None) -> dict[str, Any]:
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-import base64
+import binascii
 import io
 import logging
 import math
 
+import numpy as np
 from PIL import Image
 
 logger = logging.getLogger(__name__)
@@ -18,24 +19,32 @@ except Exception as exc:  # pragma: no cover
 else:
     _IMPORT_ERROR = None
 
-_IMAGE_MAGIC_PREFIXES = (
-    b"\x89PNG\r\n\x1a\n",
-    b"\xff\xd8\xff",  # JPEG
-    b"BM",  # BMP
-    b"GIF87a",
-    b"GIF89a",
-    b"II*\x00",  # TIFF (little-endian)
-    b"MM\x00*",  # TIFF (big-endian)
-    b"RIFF",  # WEBP starts with RIFF....WEBP
-)
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Which Symbol attribute (if any) carries encoded image bytes after buffer() depends only on
+# the installed zint-bindings version, so it is probed on the first render and reused.
+_IMAGE_BYTES_ATTRS = ("memfile", "buffer_vector", "buffered", "outfile_data")
+_image_bytes_attr: str | None = None
+_image_bytes_probed = False
 
 
 def _looks_like_image_bytes(blob: bytes) -> bool:
-    if not blob:
+    if len(blob) < 8:
         return False
-    if any(blob.startswith(prefix) for prefix in _IMAGE_MAGIC_PREFIXES):
+    head4 = blob[:4]
+    if head4 == b"\x89PNG":
+        return blob.startswith(_PNG_SIGNATURE)
+    if head4[:3] == b"\xff\xd8\xff":  # JPEG
+        return True
+    if head4[:2] == b"BM":  # BMP
+        return True
+    if head4 == b"GIF8":
+        return blob[:6] in (b"GIF87a", b"GIF89a")
+    if head4 == b"II*\x00" or head4 == b"MM\x00*":  # TIFF (little/big-endian)
         return True
-    return len(blob) >= 12 and blob.startswith(b"RIFF") and blob[8:12] == b"WEBP"
+    if head4 == b"RIFF":  # WEBP starts with RIFF....WEBP
+        return len(blob) >= 12 and blob[8:12] == b"WEBP"
+    return False
 
 
 def _try_bytes_attr(symbol: Symbol, attr_name: str) -> bytes:
@@ -48,13 +57,41 @@ def _try_bytes_attr(symbol: Symbol, attr_name: str) -> bytes:
         return b""
 
 
-def _render_from_bitmap(symbol: Symbol) -> Image.Image:
-    bm = getattr(symbol, "bitmap", None)
-    bitmap_len = len(bm) if bm is not None else 0
+def _read_image_bytes(symbol: Symbol) -> bytes:
+    global _image_bytes_attr, _image_bytes_probed
+    if _image_bytes_probed:
+        return _try_bytes_attr(symbol, _image_bytes_attr) if _image_bytes_attr else b""
 
-    if not bm:
+    img_bytes = b""
+    for attr_name in _IMAGE_BYTES_ATTRS:
+        img_bytes = _try_bytes_attr(symbol, attr_name)
+        if img_bytes:
+            if _looks_like_image_bytes(img_bytes):
+                _image_bytes_attr = attr_name
+            break
+    _image_bytes_probed = True
+    logger.info("zint image bytes source: %s", _image_bytes_attr or "bitmap")
+    return img_bytes
+
+
+def _render_from_bitmap(symbol: Symbol, size_px: int) -> Image.Image:
+    bm = getattr(symbol, "bitmap", None)
+    if bm is None or not bm:
         raise ValueError("empty bitmap from zint.Symbol.bitmap")
 
+    # zint-bindings exposes the raster as a (rows, cols, channels) memoryview. The symbol is
+    # black on white, so one channel is the greyscale image; upscale it by whole pixels here
+    # rather than through zint's scale (3 channels) or PIL's resampler.
+    shape = getattr(bm, "shape", None)
+    if shape is not None and len(shape) == 3 and shape[2] in (3, 4):
+        modules = np.asarray(bm)[:, :, 0]
+        factor = max(1, size_px // max(modules.shape))
+        if factor > 1:
+            modules = modules.repeat(factor, axis=0).repeat(factor, axis=1)
+        return Image.fromarray(np.ascontiguousarray(modules), "L")
+
+    bitmap_len = len(bm)
+
     w = None
     h = None
 
@@ -104,6 +141,25 @@ def _render_from_bitmap(symbol: Symbol) -> Image.Image:
     )
 
 
+def _fit_to_size(image: Image.Image, size_px: int) -> Image.Image:
+    image = image.convert("L")
+    if image.size == (size_px, size_px):
+        return image
+    return image.resize((size_px, size_px), resample=Image.NEAREST)
+
+
+def to_pnm_bytes(image: Image.Image) -> bytes:
+    """Binary PGM (mode L) / PPM (otherwise) bytes, which tk.PhotoImage loads without inflate."""
+    if image.mode in ("1", "L"):
+        magic = b"P5"
+        image = image.convert("L")
+    else:
+        magic = b"P6"
+        image = image.convert("RGB")
+    width, height = image.size
+    return b"%s %d %d 255\n" % (magic, width, height) + image.tobytes()
+
+
 def render_datamatrix(data: bytes, size_px: int = 320) -> Image.Image:
     if Symbol is None or Symbology is None:
         message = f"zint-bindings import failed: {_IMPORT_ERROR}"
@@ -114,47 +170,44 @@ def render_datamatrix(data: bytes, size_px: int = 320) -> Image.Image:
     bitmap_len: int | str = "n/a"
     head_hex = "n/a"
     reason = "unknown"
+    symbol = None
 
     try:
         symbol = Symbol()
         symbol.symbology = Symbology.DATAMATRIX
 
-        payload_text = base64.b64encode(data).decode("ascii")
-        symbol.encode(payload_text)
-        symbol.buffer()
+        # zint takes bytes directly; skip the str round trip of b64encode().decode().
+        symbol.encode(binascii.b2a_base64(data, newline=False))
 
-        # Preferred path: zint-bindings memfile image bytes.
-        img_bytes = _try_bytes_attr(symbol, "memfile")
+        # One pixel per module (raster output is 2px per module at scale 1.0).
+        symbol.scale = 0.5
+        symbol.buffer()
 
-        # Fallback to vector/file-like buffers that may also contain image bytes.
-        if not img_bytes:
-            for attr_name in ("buffer_vector", "buffered", "outfile_data"):
-                img_bytes = _try_bytes_attr(symbol, attr_name)
-                if img_bytes:
-                    break
+        # Preferred path: encoded image bytes (memfile or another buffer attribute).
+        img_bytes = _read_image_bytes(symbol)
 
         if img_bytes and _looks_like_image_bytes(img_bytes):
             with io.BytesIO(img_bytes) as bio:
                 image = Image.open(bio)
                 image.load()
-            return image.convert("L").resize((size_px, size_px), resample=Image.NEAREST)
-
-        # Final fallback: legacy bitmap path.
-        bitmap = getattr(symbol, "bitmap", None)
-        bitmap_len = len(bitmap) if bitmap is not None else 0
-        if bitmap:
-            head_hex = bytes(bitmap[:16]).hex()
+            return _fit_to_size(image, size_px)
 
+        # Final fallback: raw bitmap path.
         if not img_bytes:
             reason = "image bytes unavailable from memfile/buffer_vector/buffered/outfile_data"
         elif not _looks_like_image_bytes(img_bytes):
             reason = "image bytes did not match known image magic"
             head_hex = img_bytes[:16].hex() if img_bytes else head_hex
 
-        fallback_image = _render_from_bitmap(symbol)
-        return fallback_image.convert("L").resize((size_px, size_px), resample=Image.NEAREST)
+        fallback_image = _render_from_bitmap(symbol, size_px)
+        return _fit_to_size(fallback_image, size_px)
     except Exception as exc:
         img_len = len(img_bytes)
+        bitmap = getattr(symbol, "bitmap", None)
+        if bitmap is not None:
+            bitmap_bytes = memoryview(bitmap).tobytes()
+            bitmap_len = len(bitmap_bytes)
+            head_hex = bitmap_bytes[:16].hex()
         if img_bytes:
             head_hex = img_bytes[:16].hex()
         if reason == "unknown":
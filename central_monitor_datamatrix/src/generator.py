@@ -4,19 +4,24 @@ import argparse
 import shutil
 import json
 import logging
+import mmap
 import os
-import random
 import socket
+import struct
 import sys
 import time
 import atexit
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Sequence
+
+import numpy as np
 
 import cache_io
+import cache_shm
 import paths as run_paths
-from hl7_sender import send_mllp_message_with_error
+from hl7_sender import MllpClient
 
 logger = logging.getLogger(__name__)
 
@@ -43,12 +48,54 @@ GENERATOR_VITAL_SPECS = [
     ("BSR2", "BurstSuppressionRatio2", "%", 0.0, 100.0, 0),
 ]
 
+# Struct-of-arrays view of GENERATOR_VITAL_SPECS, built once; the per-cycle code indexes
+# these parallel tuples/arrays by position instead of unpacking spec tuples.
+(
+    _VITAL_CODES,
+    _VITAL_LABELS,
+    _VITAL_UNITS,
+    _VITAL_MINS,
+    _VITAL_MAXS,
+    _VITAL_DECIMALS,
+) = (tuple(column) for column in zip(*GENERATOR_VITAL_SPECS))
+_VITAL_IS_DECIMAL = tuple(decimals > 0 for decimals in _VITAL_DECIMALS)
+
+# The whole ORU^R01 message as one bytes %-template for the fixed 20-vital schema, encoded
+# once here; only the header fields and vital values are substituted per message. Integer
+# vitals use %d, decimal vitals a fixed-precision %.Nf.
+_MESSAGE_TEMPLATE = "\r".join(
+    [
+        "MSH|^~\\&|GEN|ICU|MON|ICU|%s||ORU^R01|MSG%06d|P|2.4",
+        "PID|1||%s||%s||%s|M",
+        "PV1|1|I|WARD^A^%s",
+        "OBR|1|||VITALS",
+        *[
+            f"OBX|{index + 1}|NM|{_VITAL_CODES[index]}^{_VITAL_LABELS[index]}||"
+            f"%{'d' if _VITAL_DECIMALS[index] == 0 else f'.{_VITAL_DECIMALS[index]}f'}"
+            f"|{_VITAL_UNITS[index].replace('%', '%%')}|||N"
+            for index in range(len(_VITAL_CODES))
+        ],
+        "",
+    ]
+).encode("ascii")
+
+# Per-vital bounds in integer units of the last shown digit (tenths for decimals=1), so one
+# vectorized integers() draw per cycle covers every vital with an inclusive max.
+_VITAL_SCALES = 10.0 ** np.array(_VITAL_DECIMALS)
+_VITAL_DRAW_LOWS = np.round(np.array(_VITAL_MINS) * _VITAL_SCALES).astype(np.int64)
+_VITAL_DRAW_HIGHS = np.round(np.array(_VITAL_MAXS) * _VITAL_SCALES).astype(np.int64) + 1
+_RNG = np.random.default_rng()
 
 JST = timezone(timedelta(hours=9))
 WRITER_LOCK_TIMEOUT_SEC = 2.0
 CACHE_WRITE_RETRIES = 20
 CACHE_WRITE_RETRY_DELAY_SEC = 0.05
 CACHE_WRITE_RETRY_MAX_DELAY_SEC = 1.0
+# The cache snapshot already carries packet_id; the state file is only a periodic checkpoint.
+PACKET_ID_CHECKPOINT_EVERY = 60
+PACKET_ID_MMAP_STRUCT = struct.Struct("<Q")
+TRUTH_SYNC_BYTES = 512 * 1024
+TRUTH_SYNC_INTERVAL_SEC = 60.0
 
 
 def _to_bool(value: str | bool) -> bool:
@@ -71,48 +118,100 @@ def build_patient(bed: str) -> dict[str, str]:
     }
 
 
-def build_bed_payload() -> dict[str, dict[str, Any]]:
-    vitals: dict[str, dict[str, str | float]] = {}
-    for code, _, unit, minimum, maximum, decimals in GENERATOR_VITAL_SPECS:
-        if decimals > 0:
-            value = round(random.uniform(minimum, maximum), decimals)
-        else:
-            value = float(random.randint(int(minimum), int(maximum)))
-        vitals[code] = {"value": value, "unit": unit, "flag": ""}
-    return {"vitals": vitals}
-
-
-def build_message(bed: str, msg_id: int, patient: dict[str, str], vitals: dict[str, dict[str, str | float]]) -> str:
-    now = datetime.now(JST).strftime("%Y%m%d%H%M%S")
-    header = (
-        f"MSH|^~\\&|GEN|ICU|MON|ICU|{now}||ORU^R01|MSG{msg_id:06d}|P|2.4\r"
-        f"PID|1||{patient['patient_id']}||{patient['name']}||{patient['dob']}|M\r"
-        f"PV1|1|I|WARD^A^{bed}\r"
-        "OBR|1|||VITALS\r"
+def build_bed_payloads(bed_count: int) -> list[dict[str, Any]]:
+    """Per-bed "vitals" dict for cache/truth JSON plus the same draws as positional "values"."""
+    draws = _RNG.integers(_VITAL_DRAW_LOWS, _VITAL_DRAW_HIGHS, size=(bed_count, len(_VITAL_CODES)))
+    draws = draws / _VITAL_SCALES
+
+    codes, units, is_decimal = _VITAL_CODES, _VITAL_UNITS, _VITAL_IS_DECIMAL
+    indices = range(len(codes))
+    payloads: list[dict[str, Any]] = []
+    append = payloads.append
+    for row in draws.tolist():
+        vitals: dict[str, dict[str, str | float]] = {}
+        for i in indices:
+            value = row[i]
+            vitals[codes[i]] = {"value": value if is_decimal[i] else int(value), "unit": units[i], "flag": ""}
+        append({"vitals": vitals, "values": row})
+    return payloads
+
+
+def build_message_bytes(
+    bed: str,
+    msg_id: int,
+    patient: dict[str, str],
+    values: Sequence[float],
+    now_hl7: bytes,
+) -> bytes:
+    return _MESSAGE_TEMPLATE % (
+        now_hl7,
+        msg_id,
+        patient["patient_id"].encode("utf-8"),
+        patient["name"].encode("utf-8"),
+        patient["dob"].encode("utf-8"),
+        bed.encode("utf-8"),
+        *values,
     )
 
-    obx_segments: list[str] = []
-    for index, (code, label, _, _, _, _) in enumerate(GENERATOR_VITAL_SPECS, start=1):
-        vital = vitals[code]
-        value_text = str(vital["value"])
-        unit = str(vital["unit"])
-        obx_segments.append(f"OBX|{index}|NM|{code}^{label}||{value_text}|{unit}|||N\r")
 
-    return header + "".join(obx_segments)
+class TruthWriter:
+    """Append truth records through one long-lived handle, fsyncing in batches."""
+
+    def __init__(
+        self,
+        out_path: str,
+        append: bool,
+        sync_bytes: int = TRUTH_SYNC_BYTES,
+        sync_interval_sec: float = TRUTH_SYNC_INTERVAL_SEC,
+    ) -> None:
+        self.out_path = out_path
+        self._append = append
+        self._sync_bytes = sync_bytes
+        self._sync_interval_sec = sync_interval_sec
+        self._handle: Any = None
+        self._unsynced_bytes = 0
+        self._last_sync = time.monotonic()
+
+    def write_json(self, data: bytes) -> bool:
+        """Append one already-serialized compact JSON record as a line."""
+        try:
+            if self._handle is None:
+                destination = Path(self.out_path).expanduser()
+                if destination.parent != Path(""):
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = destination.open(mode="ab" if self._append else "wb")
+            line = data + b"\n"
+            self._handle.write(line)
+            # flush keeps the line visible to tailing validators; fsync is batched below.
+            self._handle.flush()
+            self._unsynced_bytes += len(line)
+            if (
+                self._unsynced_bytes >= self._sync_bytes
+                or time.monotonic() - self._last_sync >= self._sync_interval_sec
+            ):
+                self.sync()
+            return True
+        except Exception:
+            logger.exception("failed to write truth JSONL: path=%s", self.out_path)
+            return False
 
+    def sync(self) -> None:
+        if self._handle is None:
+            return
+        os.fsync(self._handle.fileno())
+        self._unsynced_bytes = 0
+        self._last_sync = time.monotonic()
 
-def write_truth_record(out_path: str, record: dict[str, Any], append: bool) -> bool:
-    try:
-        destination = Path(out_path).expanduser()
-        if destination.parent != Path(""):
-            destination.parent.mkdir(parents=True, exist_ok=True)
-        mode = "a" if append else "w"
-        with destination.open(mode=mode, encoding="utf-8") as handle:
-            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
-        return True
-    except Exception:
-        logger.exception("failed to write truth JSONL: path=%s", out_path)
-        return False
+    def close(self) -> None:
+        if self._handle is None:
+            return
+        try:
+            self.sync()
+        except Exception:
+            logger.exception("failed to sync truth JSONL: path=%s", self.out_path)
+        finally:
+            self._handle.close()
+            self._handle = None
 
 
 def load_packet_id(state_path: Path) -> int:
@@ -131,11 +230,113 @@ def load_packet_id(state_path: Path) -> int:
         return 0
 
 
+def load_cached_packet_id(cache_path: Path) -> int:
+    if not cache_path.exists():
+        return 0
+    try:
+        payload = cache_io.load_json(cache_path)
+        return int(payload.get("packet_id", 0)) if isinstance(payload, dict) else 0
+    except Exception:
+        logger.warning("failed to read packet_id from cache %s; ignoring", cache_path)
+        return 0
+
+
 def save_packet_id(state_path: Path, value: int) -> None:
-    state_path.parent.mkdir(parents=True, exist_ok=True)
     cache_io.atomic_write_json(state_path, {"packet_id": int(value)})
 
 
+def checkpoint_packet_id(state_path: Path, value: int) -> None:
+    try:
+        save_packet_id(state_path, value)
+    except Exception as exc:
+        logger.warning("packet_id checkpoint failed (will retry at next checkpoint): %s", exc)
+
+
+def _is_packet_id_bin(data: bytes) -> bool:
+    """True for an empty or 8-byte u64 state file; JSON or decimal text is the legacy format."""
+    if not data:
+        return True
+    if len(data) != PACKET_ID_MMAP_STRUCT.size:
+        return False
+    text = data.strip()
+    return not (text.startswith(b"{") or text.isdigit())
+
+
+def migrate_packet_id_state(state_path: Path, legacy_path: Path | None = None) -> None:
+    """Rewrite a legacy JSON/text packet_id state as the u64 file MmapPacketIdStore maps.
+
+    Applies to state_path itself when it holds the old format, or to legacy_path (the old
+    default <cache>.packet_id) when state_path does not exist yet. Raises ValueError for a
+    state file in neither format rather than mapping (and overwriting) it.
+    """
+    if state_path.exists():
+        if _is_packet_id_bin(state_path.read_bytes()):
+            return
+        source = state_path
+    elif legacy_path is not None and legacy_path.exists():
+        source = legacy_path
+    else:
+        return
+    raw = source.read_text(encoding="utf-8", errors="replace").strip()
+    try:
+        if not raw:
+            value = 0
+        elif raw.startswith("{"):
+            value = int(json.loads(raw)["packet_id"])
+        else:
+            value = int(raw)
+        data = PACKET_ID_MMAP_STRUCT.pack(value)
+    except Exception:
+        raise ValueError(
+            f"packet_id state {source} is neither a u64 nor a JSON/text packet_id; "
+            "fix or remove it, or use --packet-id-format json"
+        ) from None
+    cache_io.atomic_write_bytes(state_path, data, fsync=True)
+    logger.info("migrated packet_id state %s -> %s (packet_id=%d)", source, state_path, value)
+
+
+class MmapPacketIdStore:
+    """packet_id kept as a little-endian u64 in an 8-byte memory-mapped file.
+
+    Run migrate_packet_id_state on the path first; the file is mapped as is.
+    """
+
+    def __init__(self, state_path: Path) -> None:
+        self.state_path = state_path
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(state_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            if os.fstat(fd).st_size < PACKET_ID_MMAP_STRUCT.size:
+                os.ftruncate(fd, PACKET_ID_MMAP_STRUCT.size)
+            self._map: mmap.mmap | None = mmap.mmap(fd, PACKET_ID_MMAP_STRUCT.size)
+        finally:
+            os.close(fd)
+
+    def load(self) -> int:
+        if self._map is None:
+            return 0
+        return PACKET_ID_MMAP_STRUCT.unpack_from(self._map, 0)[0]
+
+    def save(self, value: int) -> None:
+        if self._map is not None:
+            PACKET_ID_MMAP_STRUCT.pack_into(self._map, 0, int(value))
+
+    def flush(self) -> None:
+        if self._map is None:
+            return
+        try:
+            self._map.flush()
+        except Exception as exc:
+            logger.warning("packet_id mmap flush failed: path=%s (%s)", self.state_path, exc)
+
+    def close(self) -> None:
+        if self._map is None:
+            return
+        self.flush()
+        self._map.close()
+        self._map = None
+
+
 
 
 def _permission_hint(cache_path: Path) -> str:
@@ -144,11 +345,11 @@ def _permission_hint(cache_path: Path) -> str:
         f"Close JSON viewers and ensure only one writer targets {cache_path.name}."
     )
 
-def write_cache_snapshot(cache_path: Path, payload: dict[str, Any]) -> None:
+def write_cache_snapshot(cache_path: Path, data: bytes, fsync: bool = False) -> None:
     last_exc: Exception | None = None
     for attempt in range(1, CACHE_WRITE_RETRIES + 1):
         try:
-            cache_io.atomic_write_json(cache_path, payload)
+            cache_io.atomic_write_bytes(cache_path, data, fsync=fsync)
             return
         except PermissionError as exc:
             last_exc = exc
@@ -172,6 +373,7 @@ def claim_single_writer(cache_path: Path, writer_name: str) -> tuple[Path, int]:
     writer_lock_path = cache_path.with_name(f"{cache_path.name}.writer.lock")
     fd = cache_io.acquire_lock(writer_lock_path, timeout_sec=WRITER_LOCK_TIMEOUT_SEC)
     os.ftruncate(fd, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
     os.write(fd, f"writer={writer_name} pid={os.getpid()}\n".encode("utf-8"))
     return writer_lock_path, fd
 
@@ -179,10 +381,7 @@ def claim_single_writer(cache_path: Path, writer_name: str) -> tuple[Path, int]:
 def _release_claim(lock_path: Path | None, fd: int | None) -> None:
     if lock_path is None or fd is None:
         return
-    try:
-        os.close(fd)
-    finally:
-        lock_path.unlink(missing_ok=True)
+    cache_io.release_lock(fd)
 
 
 def _can_connect(host: str, port: int, timeout_sec: float = 0.8) -> bool:
@@ -292,7 +491,30 @@ def main() -> None:
         help="trueなら送信したHL7全文をtruthに含める",
     )
     ap.add_argument("--cache-out", default="generator_cache.json", help="generator用cache出力先 (receiverとは分離推奨)")
+    ap.add_argument(
+        "--cache-fsync",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=(
+            "cache書き込み毎にfsyncする (既定: しない)。packet_id stateの永続化は"
+            f"{PACKET_ID_CHECKPOINT_EVERY}件毎と正常終了時のみのため、無効時は電源断で最大"
+            f"{PACKET_ID_CHECKPOINT_EVERY - 1}件のpacket_idが失われ、再起動後に再利用され得る "
+            "(有効時は起動時にcacheのpacket_idから復元される)"
+        ),
+    )
+    ap.add_argument(
+        "--cache-shm",
+        default=None,
+        help="cacheスナップショットを同名の共有メモリにも公開する (dm_display_app --cache-shm で読む)",
+    )
+    ap.add_argument("--pretty-cache", action="store_true", help="cacheをインデント付きJSONで書き出す (既定: compact)")
     ap.add_argument("--packet-id-state", help="packet_id 永続化ファイルパス（省略時はcache横）")
+    ap.add_argument(
+        "--packet-id-format",
+        choices=["mmap", "json"],
+        default="mmap",
+        help="packet_id 永続化形式 (mmap: 8byte固定長ファイル / json: 従来のJSON)",
+    )
     ap.add_argument("--export-root", default=None, help="指定時、最終成果物をこのルートへコピー")
     args = ap.parse_args()
 
@@ -313,12 +535,54 @@ def main() -> None:
 
     msg_id = 1
     beds = [f"BED{i:02d}" for i in range(1, 7)]
+    patients = {bed: build_patient(bed) for bed in beds}
+    mllp_clients = {bed: MllpClient(args.host, args.port, timeout=args.ack_timeout) for bed in beds}
+    for client in mllp_clients.values():
+        atexit.register(client.close)
+    send_executor = ThreadPoolExecutor(max_workers=len(beds), thread_name_prefix="mllp-send")
+    atexit.register(send_executor.shutdown)
     loop = 0
-    truth_append_mode = bool(args.append_truth)
+
+    truth_out_path: str | None = None
+    if args.truth_out:
+        truth_path = run_paths.resolve_in_run_dir(args.truth_out, run_dir)
+        if truth_path is not None:
+            truth_out_path = str(truth_path)
+    else:
+        truth_out_path = str(run_dir / "generator_results.jsonl")
+
+    if args.truth_out_default_dataset:
+        logger.warning("--truth-out-default-dataset is deprecated. run_dir is now used by default.")
+
+    truth_writer: TruthWriter | None = None
+    if truth_out_path:
+        truth_writer = TruthWriter(truth_out_path, append=bool(args.append_truth))
+        atexit.register(truth_writer.close)
 
     cache_path = run_paths.resolve_work_path(args.cache_out, work_root)
-    packet_state_path = run_paths.resolve_work_path(args.packet_id_state, work_root, default_rel=cache_path.with_suffix(".packet_id"))
-    packet_id = load_packet_id(packet_state_path)
+    cache_shm_writer: cache_shm.ShmCacheWriter | None = None
+    if args.cache_shm:
+        cache_shm_writer = cache_shm.ShmCacheWriter(args.cache_shm)
+        atexit.register(cache_shm_writer.close)
+    packet_store: MmapPacketIdStore | None = None
+    if args.packet_id_format == "mmap":
+        packet_state_path = run_paths.resolve_work_path(
+            args.packet_id_state, work_root, default_rel=cache_path.with_suffix(".packet_id.bin")
+        )
+        # The old default JSON state next to the cache seeds a .bin that does not exist yet.
+        legacy_state_path = None if args.packet_id_state else cache_path.with_suffix(".packet_id")
+        try:
+            migrate_packet_id_state(packet_state_path, legacy_state_path)
+        except ValueError as exc:
+            ap.error(str(exc))
+        packet_store = MmapPacketIdStore(packet_state_path)
+        atexit.register(packet_store.close)
+        packet_id = max(packet_store.load(), load_cached_packet_id(cache_path))
+    else:
+        packet_state_path = run_paths.resolve_work_path(
+            args.packet_id_state, work_root, default_rel=cache_path.with_suffix(".packet_id")
+        )
+        packet_id = max(load_packet_id(packet_state_path), load_cached_packet_id(cache_path))
     claim_lock_path: Path | None = None
     claim_fd: int | None = None
     try:
@@ -328,12 +592,18 @@ def main() -> None:
     atexit.register(_release_claim, claim_lock_path, claim_fd)
 
     while args.count < 0 or loop < args.count:
-        cycle_now_ms = int(datetime.now(JST).timestamp() * 1000)
-        cycle_iso = datetime.fromtimestamp(cycle_now_ms / 1000.0, tz=JST).isoformat(timespec="milliseconds")
-        cycle_epoch_ms = cycle_now_ms
+        cycle_ts = datetime.now(JST)
+        # Integer ms (no float *1000 rounding) so epoch_ms and the truncated ISO string agree.
+        cycle_epoch_ms = int(cycle_ts.timestamp()) * 1000 + cycle_ts.microsecond // 1000
+        cycle_iso = cycle_ts.isoformat(timespec="milliseconds")
+        cycle_hl7_ts = cycle_ts.strftime("%Y%m%d%H%M%S").encode("ascii")
         cycle_beds: dict[str, dict[str, Any]] = {}
-        hl7_messages: list[str] = []
-        receiver_reachable = _can_connect(args.host, args.port)
+        hl7_messages: list[bytes] = []
+        # Live kept-alive connections already prove reachability; probe with a fresh
+        # connection only when none is open, so steady-state cycles open no sockets.
+        receiver_reachable = any(client.connected for client in mllp_clients.values()) or _can_connect(
+            args.host, args.port
+        )
         if not receiver_reachable:
             logger.warning(
                 "receiver unreachable for this cycle (%s:%d). will still generate cache/truth but skip MLLP send.",
@@ -341,84 +611,93 @@ def main() -> None:
                 args.port,
             )
 
-        for bed in beds:
-            payload = build_bed_payload()
-            patient = build_patient(bed)
-            message = build_message(bed, msg_id, patient, payload["vitals"])
+        outgoing: list[tuple[str, int, bytes]] = []
+        for bed, payload in zip(beds, build_bed_payloads(len(beds))):
+            patient = patients[bed]
+            message = build_message_bytes(bed, msg_id, patient, payload["values"], cycle_hl7_ts)
             cycle_beds[bed] = {"patient": patient, "vitals": payload["vitals"]}
             if args.truth_include_hl7:
                 hl7_messages.append(message)
+            outgoing.append((bed, msg_id, message))
+            msg_id += 1
 
-            if receiver_reachable:
-                ok, send_error = send_mllp_message_with_error(
+        if receiver_reachable:
+            # Each bed owns its client, so the sends overlap without sharing a socket.
+            results = send_executor.map(lambda item: mllp_clients[item[0]].send_with_error(item[2]), outgoing)
+            for (bed, message_id, _), (ok, send_error) in zip(outgoing, results):
+                if ok:
+                    logger.info("sent message_id=MSG%06d bed=%s", message_id, bed)
+                    continue
+                detail = f" ({send_error})" if send_error else ""
+                logger.warning(
+                    "send failed message_id=MSG%06d bed=%s (%s:%d)%s",
+                    message_id,
+                    bed,
                     args.host,
                     args.port,
-                    message,
-                    timeout=args.ack_timeout,
+                    detail,
                 )
-                if ok:
-                    logger.info("sent message_id=MSG%06d bed=%s", msg_id, bed)
-                else:
-                    detail = f" ({send_error})" if send_error else ""
-                    logger.warning(
-                        "send failed message_id=MSG%06d bed=%s (%s:%d)%s",
-                        msg_id,
-                        bed,
-                        args.host,
-                        args.port,
-                        detail,
-                    )
-                    if send_error and "ACK timed out" in send_error:
-                        _log_ack_timeout_hint(args.host, args.port, args.ack_timeout)
-                        receiver_hint_logged = True
-                    elif not receiver_hint_logged:
-                        receiver_hint_logged = _log_remote_receiver_hint(args.host, args.port)
-            elif not receiver_hint_logged:
-                receiver_hint_logged = _log_remote_receiver_hint(args.host, args.port)
-            msg_id += 1
+                if send_error and "ACK timed out" in send_error:
+                    _log_ack_timeout_hint(args.host, args.port, args.ack_timeout)
+                    receiver_hint_logged = True
+                elif not receiver_hint_logged:
+                    receiver_hint_logged = _log_remote_receiver_hint(args.host, args.port)
+        elif not receiver_hint_logged:
+            receiver_hint_logged = _log_remote_receiver_hint(args.host, args.port)
 
         packet_id += 1
-        cache_record = {
-            "epoch_ms": cycle_epoch_ms,
-            "ts": cycle_iso,
-            "packet_id": packet_id,
-            "source": "generator",
-            "beds": cycle_beds,
-        }
+        # cycle_beds is the bulk of both the cache and the truth record; encode it once.
+        beds_json = cache_io.dumps_json(cycle_beds)
+        if args.pretty_cache:
+            cache_data = cache_io.dumps_json(
+                {
+                    "epoch_ms": cycle_epoch_ms,
+                    "ts": cycle_iso,
+                    "packet_id": packet_id,
+                    "source": "generator",
+                    "beds": cycle_beds,
+                },
+                pretty=True,
+            )
+        else:
+            cache_data = cache_io.dumps_json_object(
+                {"epoch_ms": cycle_epoch_ms, "ts": cycle_iso, "packet_id": packet_id, "source": "generator"},
+                {"beds": beds_json},
+            )
+        if cache_shm_writer is not None and not cache_shm_writer.publish(cache_data):
+            logger.warning("cache snapshot (%d bytes) does not fit shared memory %s", len(cache_data), args.cache_shm)
         try:
-            write_cache_snapshot(cache_path, cache_record)
-            save_packet_id(packet_state_path, packet_id)
+            write_cache_snapshot(cache_path, cache_data, fsync=args.cache_fsync)
         except Exception as exc:
             logger.warning("cache snapshot write failed (will continue next cycle): %s", exc)
-
-        truth_out_path: str | None = None
-        if args.truth_out:
-            truth_path = run_paths.resolve_in_run_dir(args.truth_out, run_dir)
-            if truth_path is not None:
-                truth_out_path = str(truth_path)
-        else:
-            truth_out_path = str(run_dir / "generator_results.jsonl")
-
-        if args.truth_out_default_dataset:
-            logger.warning("--truth-out-default-dataset is deprecated. run_dir is now used by default.")
-
-        if truth_out_path and ((loop + 1) % args.truth_every_n == 0):
-            truth_record: dict[str, Any] = {
-                "ts": cycle_iso,
-                "epoch_ms": cycle_epoch_ms,
-                "packet_id": packet_id,
-                "source": "generator",
-                "beds": cycle_beds,
-            }
+        if packet_store is not None:
+            # Dirties one page; msync is left to the OS except at checkpoints.
+            packet_store.save(packet_id)
+            if packet_id % PACKET_ID_CHECKPOINT_EVERY == 0:
+                packet_store.flush()
+        elif packet_id % PACKET_ID_CHECKPOINT_EVERY == 0:
+            checkpoint_packet_id(packet_state_path, packet_id)
+
+        if truth_writer is not None and ((loop + 1) % args.truth_every_n == 0):
+            truth_fragments = {"beds": beds_json}
             if args.truth_include_hl7:
-                truth_record["hl7"] = "\n".join(hl7_messages)
+                truth_fragments["hl7"] = cache_io.dumps_json(b"\n".join(hl7_messages).decode("utf-8"))
 
-            write_truth_record(truth_out_path, truth_record, append=truth_append_mode)
-            truth_append_mode = True
+            truth_writer.write_json(
+                cache_io.dumps_json_object(
+                    {"ts": cycle_iso, "epoch_ms": cycle_epoch_ms, "packet_id": packet_id, "source": "generator"},
+                    truth_fragments,
+                )
+            )
 
         loop += 1
         time.sleep(args.interval)
 
+    if packet_store is not None:
+        packet_store.close()
+    else:
+        checkpoint_packet_id(packet_state_path, packet_id)
+
     if args.export_root:
         export_root = Path(args.export_root).expanduser()
         export_root.mkdir(parents=True, exist_ok=True)
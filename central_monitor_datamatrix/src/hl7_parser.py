@@ -29,8 +29,11 @@ def _parse_obx_segments(segments: List[str]) -> Dict[str, Dict[str, Any]]:
     return vitals
 
 
-def parse_hl7_message(raw_message: str) -> Dict[str, Any]:
-    """Parse minimal HL7 v2 ORU-like message into monitor cache schema."""
+def parse_hl7_message(raw_message: str, received_ts: str | None = None) -> Dict[str, Any]:
+    """Parse minimal HL7 v2 ORU-like message into monitor cache schema.
+
+    received_ts lets the caller supply the ISO receive time it already computed.
+    """
     segments = [s for s in raw_message.replace("\r\n", "\r").split("\r") if s.strip()]
     bed = "UNKNOWN"
     patient = {}
@@ -50,7 +53,7 @@ def parse_hl7_message(raw_message: str) -> Dict[str, Any]:
     vitals = _parse_obx_segments(segments)
 
     return {
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": received_ts or datetime.now(timezone.utc).isoformat(),
         "bed": bed,
         "patient": patient,
         "vitals": vitals,
@@ -4,6 +4,7 @@ import argparse
 import atexit
 import logging
 import os
+import selectors
 import socket
 import threading
 import time
@@ -13,16 +14,25 @@ from pathlib import Path
 from typing import Any, Dict
 
 import cache_io
+import cache_shm
 import paths as run_paths
 from hl7_parser import parse_hl7_message
 
 SB = b"\x0b"
 EB_CR = b"\x1c\x0d"
+# ACK frames are fixed, so frame them once instead of per message.
+_ACK_OK = SB + b"MSA|AA|OK" + EB_CR
+_ACK_EMPTY = SB + b"MSA|AE|EMPTY" + EB_CR
+_ACK_PARSE_ERROR = SB + b"MSA|AE|PARSE_ERROR" + EB_CR
 logger = logging.getLogger(__name__)
 WRITER_LOCK_TIMEOUT_SEC = 2.0
 CACHE_WRITE_RETRIES = 20
 CACHE_WRITE_RETRY_DELAY_SEC = 0.05
 CACHE_WRITE_RETRY_MAX_DELAY_SEC = 1.0
+CACHE_FLUSH_INTERVAL_SEC = 0.05
+CLIENT_IDLE_TIMEOUT_SEC = 2.0
+# Connections may carry many frames; one with no partial frame pending is closed after this long.
+CLIENT_KEEPALIVE_TIMEOUT_SEC = 60.0
 
 
 @dataclass
@@ -30,33 +40,62 @@ class BedDataAggregator:
     beds: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     packet_id: int = 0
     lock: threading.Lock = field(default_factory=threading.Lock)
+    # Encoded JSON per bed, refreshed at snapshot time only for beds updated since the last one.
+    _bed_json: Dict[str, bytes] = field(default_factory=dict, init=False, repr=False)
+    _dirty_beds: set[str] = field(default_factory=set, init=False, repr=False)
 
-    def update_from_parsed(self, parsed: Dict[str, Any]) -> None:
+    def update_from_parsed(self, parsed: Dict[str, Any], now_iso: str | None = None) -> None:
         bed = parsed.get("bed", "UNKNOWN")
+        ts = parsed.get("ts") or now_iso or datetime.now(timezone.utc).isoformat()
         self.beds[bed] = {
-            "ts": parsed.get("ts", datetime.now(timezone.utc).isoformat()),
+            "ts": ts,
             "patient": parsed.get("patient", {}),
             "vitals": parsed.get("vitals", {}),
         }
-
-    def snapshot(self) -> Dict[str, Any]:
-        now = datetime.now(timezone.utc)
+        self._dirty_beds.add(bed)
+
+    def snapshot_bytes(self, now: datetime | None = None) -> bytes:
+        """Compact JSON of snapshot(), re-encoding only beds changed since the previous call."""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        for bed in self._dirty_beds:
+            self._bed_json[bed] = cache_io.dumps_json(self.beds[bed])
+        self._dirty_beds.clear()
+        self.packet_id += 1
+        return cache_io.dumps_json_object(
+            {
+                "epoch_ms": int(now.timestamp()) * 1000 + now.microsecond // 1000,
+                "ts": now.isoformat(timespec="milliseconds"),
+                "packet_id": self.packet_id,
+                "source": "hl7_receiver",
+            },
+            {"beds": cache_io.dumps_json_object({}, self._bed_json)},
+        )
+
+    def snapshot(self, now: datetime | None = None) -> Dict[str, Any]:
+        if now is None:
+            now = datetime.now(timezone.utc)
         self.packet_id += 1
         return {
-            "epoch_ms": int(now.timestamp() * 1000),
+            "epoch_ms": int(now.timestamp()) * 1000 + now.microsecond // 1000,
             "ts": now.isoformat(timespec="milliseconds"),
             "packet_id": self.packet_id,
             "source": "hl7_receiver",
-            "beds": self.beds,
+            # Bed entries are replaced, never mutated, so a shallow copy is a stable view.
+            "beds": dict(self.beds),
         }
 
 
 def _extract_mllp_payload(data: bytes) -> str:
-    start = data.find(SB)
-    end = data.find(EB_CR)
-    if start == -1 or end == -1 or end <= start:
+    # SB is normally the first byte; only scan for it otherwise, then look for EB_CR
+    # after it so the prefix is never swept twice.
+    start = 0 if data[:1] == SB else data.find(SB)
+    if start == -1:
         return ""
-    return data[start + 1 : end].decode("utf-8", errors="ignore")
+    end = data.find(EB_CR, start + 1)
+    if end == -1:
+        return ""
+    return str(memoryview(data)[start + 1 : end], "utf-8", "ignore")
 
 
 
@@ -67,11 +106,13 @@ def _permission_hint(cache_path: Path) -> str:
         f"Close JSON viewers and ensure only one writer targets {cache_path.name}."
     )
 
-def _write_cache_atomic(cache_path: Path, payload: Dict[str, Any]) -> None:
+def _write_cache_atomic(cache_path: Path, data: bytes, fsync: bool = False) -> None:
+    # The cache is a live snapshot rewritten many times a second; os.replace keeps readers
+    # consistent without fsync, which is only worth paying for on request or at shutdown.
     last_exc: Exception | None = None
     for attempt in range(1, CACHE_WRITE_RETRIES + 1):
         try:
-            cache_io.atomic_write_json(cache_path, payload)
+            cache_io.atomic_write_bytes(cache_path, data, fsync=fsync)
             return
         except PermissionError as exc:
             last_exc = exc
@@ -95,6 +136,7 @@ def claim_single_writer(cache_path: Path, writer_name: str) -> tuple[Path, int]:
     writer_lock_path = cache_path.with_name(f"{cache_path.name}.writer.lock")
     fd = cache_io.acquire_lock(writer_lock_path, timeout_sec=WRITER_LOCK_TIMEOUT_SEC)
     os.ftruncate(fd, 0)
+    os.lseek(fd, 0, os.SEEK_SET)
     os.write(fd, f"writer={writer_name} pid={os.getpid()}\n".encode("utf-8"))
     return writer_lock_path, fd
 
@@ -102,69 +144,267 @@ def claim_single_writer(cache_path: Path, writer_name: str) -> tuple[Path, int]:
 def _release_claim(lock_path: Path | None, fd: int | None) -> None:
     if lock_path is None or fd is None:
         return
-    try:
-        os.close(fd)
-    finally:
-        lock_path.unlink(missing_ok=True)
+    cache_io.release_lock(fd)
+
 
+def _encode_snapshot(aggregator: BedDataAggregator, pretty: bool, now: datetime | None = None) -> bytes:
+    # Caller holds aggregator.lock.
+    if pretty:
+        return cache_io.dumps_json(aggregator.snapshot(now), pretty=True)
+    return aggregator.snapshot_bytes(now)
 
-def _handle_client(conn: socket.socket, aggregator: BedDataAggregator, cache_path: Path) -> None:
+
+def _flush_cache(
+    aggregator: BedDataAggregator,
+    cache_path: Path,
+    pretty: bool = False,
+    fsync: bool = False,
+    shm: cache_shm.ShmCacheWriter | None = None,
+) -> None:
+    now = datetime.now(timezone.utc)
+    with aggregator.lock:
+        data = _encode_snapshot(aggregator, pretty, now)
+        # Published under the lock: the shared memory segment takes one writer at a time.
+        if shm is not None and not shm.publish(data):
+            logger.warning("cache snapshot (%d bytes) does not fit shared memory %s", len(data), shm.name)
     try:
-        conn.settimeout(2.0)
-        chunks: list[bytes] = []
-        while True:
-            try:
-                chunk = conn.recv(4096)
-            except TimeoutError:
-                break
-            if not chunk:
-                break
-            chunks.append(chunk)
-            # Stop once a full MLLP frame is received.
-            if EB_CR in chunk or b"\x1c" in chunk:
-                break
+        _write_cache_atomic(cache_path, data, fsync=fsync)
+    except Exception as exc:
+        logger.warning("cache update failed (will retry on next update): %s", exc)
+
+
+def _cache_writer_loop(
+    aggregator: BedDataAggregator,
+    cache_path: Path,
+    flush_event: threading.Event,
+    flush_interval_sec: float,
+    pretty: bool = False,
+    fsync: bool = False,
+    shm: cache_shm.ShmCacheWriter | None = None,
+) -> None:
+    """Write at most one snapshot per interval; updates arriving meanwhile coalesce into it."""
+    while True:
+        flush_event.wait()
+        flush_event.clear()
+        _flush_cache(aggregator, cache_path, pretty, fsync, shm)
+        time.sleep(flush_interval_sec)
 
-        data = b"".join(chunks)
-        message = _extract_mllp_payload(data)
-        if not message:
-            conn.sendall(SB + b"MSA|AE|EMPTY" + EB_CR)
-            return
 
-        try:
-            parsed = parse_hl7_message(message)
-        except Exception as exc:
-            logger.warning("failed to parse HL7 message: %s", exc)
-            conn.sendall(SB + b"MSA|AE|PARSE_ERROR" + EB_CR)
-            return
+@dataclass
+class _ClientState:
+    conn: socket.socket
+    last_activity: float
+    buffer: bytearray = field(default_factory=bytearray)
+    # ACK bytes the socket has not taken yet, flushed on EVENT_WRITE.
+    outbox: bytearray = field(default_factory=bytearray)
+    # Set once the peer is done sending: close as soon as the outbox is flushed.
+    closing: bool = False
+
+
+def _process_frame(data: bytes, aggregator: BedDataAggregator, flush_event: threading.Event) -> bytes:
+    """Apply one received MLLP frame to the aggregator and return the ACK frame to send."""
+    message = _extract_mllp_payload(data)
+    if not message:
+        return _ACK_EMPTY
+
+    now_iso = datetime.now(timezone.utc).isoformat()
+    try:
+        parsed = parse_hl7_message(message, received_ts=now_iso)
+    except Exception as exc:
+        logger.warning("failed to parse HL7 message: %s", exc)
+        return _ACK_PARSE_ERROR
 
-        with aggregator.lock:
-            aggregator.update_from_parsed(parsed)
-            snapshot = aggregator.snapshot()
+    with aggregator.lock:
+        aggregator.update_from_parsed(parsed, now_iso)
+    flush_event.set()
+    return _ACK_OK
 
-        conn.sendall(SB + b"MSA|AA|OK" + EB_CR)
 
+def _flush_acks(sel: selectors.BaseSelector, state: _ClientState) -> None:
+    """Send what the socket takes without blocking and wait for EVENT_WRITE for the rest."""
+    outbox = state.outbox
+    if outbox:
         try:
-            _write_cache_atomic(cache_path, snapshot)
-        except Exception as exc:
-            logger.warning("cache update failed after ACK (skip this tick): %s", exc)
+            sent = state.conn.send(outbox)
+        except BlockingIOError:
+            sent = 0
+        if sent:
+            del outbox[:sent]
+            state.last_activity = time.monotonic()
+    if outbox:
+        # Stop reading until the peer takes its ACKs, so a client that never reads cannot
+        # grow the outbox without bound or hold up the other connections.
+        sel.modify(state.conn, selectors.EVENT_WRITE, state)
+    elif state.closing:
+        _close_client(sel, state)
+    else:
+        sel.modify(state.conn, selectors.EVENT_READ, state)
+
+
+def _queue_ack(sel: selectors.BaseSelector, state: _ClientState, ack: bytes) -> None:
+    state.outbox += ack
+    _flush_acks(sel, state)
+
+
+def _drain_frames(
+    sel: selectors.BaseSelector,
+    state: _ClientState,
+    aggregator: BedDataAggregator,
+    flush_event: threading.Event,
+) -> None:
+    """ACK every complete frame in the buffer in one write, leaving any trailing partial frame."""
+    buffer = state.buffer
+    acks: list[bytes] = []
+    while True:
+        end = buffer.find(EB_CR)
+        if end == -1:
+            break
+        end += len(EB_CR)
+        acks.append(_process_frame(bytes(buffer[:end]), aggregator, flush_event))
+        del buffer[:end]
+    if acks:
+        # Pipelining clients send several frames per read; their ACKs go back as one segment.
+        _queue_ack(sel, state, b"".join(acks))
+
+
+def _close_client(sel: selectors.BaseSelector, state: _ClientState) -> None:
+    sel.unregister(state.conn)
+    state.conn.close()
+
+
+def _finish_client(
+    sel: selectors.BaseSelector,
+    state: _ClientState,
+    aggregator: BedDataAggregator,
+    flush_event: threading.Event,
+) -> None:
+    """Answer whatever partial frame is pending, then close once every ACK has been sent."""
+    state.closing = True
+    try:
+        if state.buffer:
+            ack = _process_frame(bytes(state.buffer), aggregator, flush_event)
+            state.buffer.clear()
+            _queue_ack(sel, state, ack)
+        else:
+            _flush_acks(sel, state)
+    except OSError as exc:
+        logger.debug("failed to send ACK: %s", exc)
+        _close_client(sel, state)
+
+
+def _serve_loop(server: socket.socket, aggregator: BedDataAggregator, flush_event: threading.Event) -> None:
+    """Accept and read every client on one thread; a connection may carry any number of frames."""
+    sel = selectors.DefaultSelector()
+    server.setblocking(False)
+    sel.register(server, selectors.EVENT_READ, None)
+    try:
+        while True:
+            for key, events in sel.select(timeout=CLIENT_IDLE_TIMEOUT_SEC / 4):
+                if key.data is None:
+                    try:
+                        conn, _ = server.accept()
+                    except BlockingIOError:
+                        continue
+                    conn.setblocking(False)
+                    # ACKs are tiny writes; without this Nagle holds each one back until the
+                    # client's delayed ACK of the previous one (~40 ms per pipelined batch).
+                    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    sel.register(conn, selectors.EVENT_READ, _ClientState(conn, time.monotonic()))
+                    continue
+
+                state: _ClientState = key.data
+                if events & selectors.EVENT_WRITE:
+                    try:
+                        _flush_acks(sel, state)
+                    except OSError as exc:
+                        logger.debug("failed to send ACK: %s", exc)
+                        _close_client(sel, state)
+                    continue
+                try:
+                    chunk = state.conn.recv(4096)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    _close_client(sel, state)
+                    continue
+                if not chunk:
+                    # Peer closed; answer a trailing partial frame as before.
+                    _finish_client(sel, state, aggregator, flush_event)
+                    continue
+                state.buffer += chunk
+                state.last_activity = time.monotonic()
+                # EB_CR may straddle two reads, so check the tail of the buffer, not the chunk.
+                if EB_CR in state.buffer[-len(chunk) - 1 :]:
+                    try:
+                        _drain_frames(sel, state, aggregator, flush_event)
+                    except OSError as exc:
+                        logger.debug("failed to send ACK: %s", exc)
+                        _close_client(sel, state)
+
+            # Clients that stall mid-frame are answered with what they sent, as on a recv timeout;
+            # clients that stop reading their ACKs are dropped; idle persistent connections are
+            # dropped after the keep-alive timeout.
+            now = time.monotonic()
+            expired = [
+                key.data
+                for key in sel.get_map().values()
+                if key.data is not None
+                and now - key.data.last_activity
+                >= (CLIENT_IDLE_TIMEOUT_SEC if key.data.buffer or key.data.outbox else CLIENT_KEEPALIVE_TIMEOUT_SEC)
+            ]
+            for state in expired:
+                if state.outbox:
+                    logger.debug("dropping client that stopped reading ACKs (%d bytes pending)", len(state.outbox))
+                    _close_client(sel, state)
+                else:
+                    _finish_client(sel, state, aggregator, flush_event)
     finally:
-        conn.close()
-
-
-def serve(host: str, port: int, cache_path: Path) -> None:
+        for key in list(sel.get_map().values()):
+            if key.data is not None:
+                key.data.conn.close()
+        sel.close()
+
+
+def serve(
+    host: str,
+    port: int,
+    cache_path: Path,
+    flush_interval_sec: float = CACHE_FLUSH_INTERVAL_SEC,
+    pretty_cache: bool = False,
+    cache_fsync: bool = False,
+    cache_shm_name: str | None = None,
+) -> None:
     aggregator = BedDataAggregator()
     cache_path.parent.mkdir(parents=True, exist_ok=True)
+    shm: cache_shm.ShmCacheWriter | None = None
+    if cache_shm_name:
+        shm = cache_shm.ShmCacheWriter(cache_shm_name)
+        atexit.register(shm.close)
     with aggregator.lock:
-        _write_cache_atomic(cache_path, aggregator.snapshot())
+        data = _encode_snapshot(aggregator, pretty_cache)
+        if shm is not None:
+            shm.publish(data)
+        _write_cache_atomic(cache_path, data, fsync=cache_fsync)
+
+    flush_event = threading.Event()
+    threading.Thread(
+        target=_cache_writer_loop,
+        args=(aggregator, cache_path, flush_event, flush_interval_sec, pretty_cache, cache_fsync, shm),
+        name="cache-writer",
+        daemon=True,
+    ).start()
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((host, port))
-        s.listen(5)
-        print(f"HL7 receiver listening on {host}:{port}")
-        while True:
-            conn, _ = s.accept()
-            threading.Thread(target=_handle_client, args=(conn, aggregator, cache_path), daemon=True).start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((host, port))
+            s.listen(5)
+            print(f"HL7 receiver listening on {host}:{port}")
+            _serve_loop(s, aggregator, flush_event)
+    finally:
+        # Updates still waiting for the writer thread would otherwise be lost on shutdown.
+        if flush_event.is_set():
+            _flush_cache(aggregator, cache_path, pretty_cache, fsync=True, shm=shm)
 
 
 def main() -> None:
@@ -180,7 +420,27 @@ def main() -> None:
     ap.add_argument("--port", type=int, default=2575)
     ap.add_argument("--cache", default="receiver_cache.json", help="receiver用cache出力先 (generatorとは分離推奨)")
     ap.add_argument("--work-root", default=None, help="作業ルート。未指定時は C:/Users/sakai/HL7_DM_test")
+    ap.add_argument(
+        "--cache-flush-interval",
+        type=float,
+        default=CACHE_FLUSH_INTERVAL_SEC,
+        help="cache書き込みの最小間隔秒。間隔内の更新はまとめて1回で書き込む",
+    )
+    ap.add_argument(
+        "--cache-fsync",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="cache書き込み毎にfsyncする (既定: しない。終了時の最終書き込みは常にfsync)",
+    )
+    ap.add_argument(
+        "--cache-shm",
+        default=None,
+        help="cacheスナップショットを同名の共有メモリにも公開する (dm_display_app --cache-shm で読む)",
+    )
+    ap.add_argument("--pretty-cache", action="store_true", help="cacheをインデント付きJSONで書き出す (既定: compact)")
     args = ap.parse_args()
+    if args.cache_flush_interval < 0:
+        ap.error("--cache-flush-interval must be >= 0")
     work_root = run_paths.resolve_work_root(args.work_root)
     logger.info("work_root=%s", work_root)
     cache_path = run_paths.resolve_work_path(args.cache, work_root)
@@ -191,7 +451,15 @@ def main() -> None:
     except TimeoutError as exc:
         logger.warning("writer claim timed out; continuing without exclusive claim: %s", exc)
     atexit.register(_release_claim, claim_lock_path, claim_fd)
-    serve(args.host, args.port, cache_path)
+    serve(
+        args.host,
+        args.port,
+        cache_path,
+        flush_interval_sec=args.cache_flush_interval,
+        pretty_cache=args.pretty_cache,
+        cache_fsync=args.cache_fsync,
+        cache_shm_name=args.cache_shm,
+    )
 
 
 if __name__ == "__main__":
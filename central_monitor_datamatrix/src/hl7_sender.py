@@ -1,27 +1,100 @@
 from __future__ import annotations
 
+import atexit
+import select
 import socket
+import threading
+from typing import Sequence
 
 SB = b"\x0b"
 EB_CR = b"\x1c\x0d"
+ACK_TIMEOUT_ERROR = (
+    "connection established but ACK timed out "
+    "(receiver may not return MLLP ACK quickly enough for current timeout)"
+)
+# sendmsg (gather write) is POSIX-only; Windows falls back to one joined sendall.
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
 
 
-def send_mllp_message(host: str, port: int, hl7_message: str, timeout: float = 3.0) -> bool:
-    ok, _ = send_mllp_message_with_error(host, port, hl7_message, timeout=timeout)
+_FRAME_BUFFER_SIZE = 8192
+_TLS = threading.local()
+
+
+def _framed_view(message: bytes) -> memoryview:
+    """SB + message + EB_CR laid out in this thread's reusable buffer."""
+    size = len(SB) + len(message) + len(EB_CR)
+    buf = getattr(_TLS, "frame_buf", None)
+    if buf is None or len(buf) < size:
+        # Replace rather than resize: a view from an earlier send may still be referenced.
+        buf = _TLS.frame_buf = bytearray(max(_FRAME_BUFFER_SIZE, size))
+    end = len(SB) + len(message)
+    buf[: len(SB)] = SB
+    buf[len(SB) : end] = message
+    buf[end:size] = EB_CR
+    return memoryview(buf)[:size]
+
+
+def _send_frame(sock: socket.socket, message: bytes) -> None:
+    if not _HAS_SENDMSG:
+        sock.sendall(_framed_view(message))
+        return
+    sent = sock.sendmsg((SB, message, EB_CR))
+    if sent < len(SB) + len(message) + len(EB_CR):
+        sock.sendall(_framed_view(message)[sent:])
+
+
+def _send_frames(sock: socket.socket, messages: Sequence[bytes]) -> None:
+    """Write several MLLP frames back to back with one gather write where available."""
+    parts: list[bytes] = []
+    for message in messages:
+        parts += (SB, message, EB_CR)
+    if not _HAS_SENDMSG:
+        sock.sendall(b"".join(parts))
+        return
+    sent = sock.sendmsg(parts)
+    if sent < sum(map(len, parts)):
+        sock.sendall(b"".join(parts)[sent:])
+
+
+def send_mllp_message(
+    host: str,
+    port: int,
+    hl7_message: str | bytes,
+    timeout: float = 3.0,
+    keep_alive: bool = True,
+) -> bool:
+    ok, _ = send_mllp_message_with_error(host, port, hl7_message, timeout=timeout, keep_alive=keep_alive)
     return ok
 
 
 def send_mllp_message_with_error(
     host: str,
     port: int,
-    hl7_message: str,
+    hl7_message: str | bytes,
     timeout: float = 3.0,
+    keep_alive: bool = True,
 ) -> tuple[bool, str | None]:
-    payload = SB + hl7_message.encode("utf-8") + EB_CR
+    """Send one message and wait for its ACK.
+
+    By default the frame goes over a pooled connection per (host, port). keep_alive=False
+    uses a fresh connection with a half-close, for receivers that only ACK after EOF.
+    """
+    if keep_alive:
+        return _pooled_client(host, port, timeout).send_with_error(hl7_message)
+    return _send_oneshot_with_error(host, port, hl7_message, timeout)
+
+
+def _send_oneshot_with_error(
+    host: str,
+    port: int,
+    hl7_message: str | bytes,
+    timeout: float,
+) -> tuple[bool, str | None]:
+    message = hl7_message.encode("utf-8") if isinstance(hl7_message, str) else hl7_message
     try:
         with socket.create_connection((host, port), timeout=timeout) as s:
             s.settimeout(timeout)
-            s.sendall(payload)
+            s.sendall(_framed_view(message))
             # Some receivers only start ACK processing after EOF on request stream.
             # Half-close write side so ACK can be returned without waiting for a full close.
             s.shutdown(socket.SHUT_WR)
@@ -35,11 +108,7 @@ def send_mllp_message_with_error(
                     if EB_CR in chunk or b"\x1c" in chunk:
                         break
             except TimeoutError:
-                return (
-                    False,
-                    "connection established but ACK timed out "
-                    "(receiver may not return MLLP ACK quickly enough for current timeout)",
-                )
+                return False, ACK_TIMEOUT_ERROR
         ack = b"".join(ack_chunks)
         if not ack:
             return False, "connection established but no ACK returned"
@@ -50,3 +119,181 @@ def send_mllp_message_with_error(
         return False, "connection refused"
     except OSError as exc:
         return False, str(exc)
+
+
+class MllpClient:
+    """Send MLLP frames over one kept-alive TCP connection.
+
+    The write side is never half-closed, so the receiver must ACK on the end-of-block
+    marker rather than on EOF. Sends are serialized, so one client may be shared by threads.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 3.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.settimeout(self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        return sock
+
+    @staticmethod
+    def _is_stale(sock: socket.socket) -> bool:
+        # Between exchanges nothing should be readable: EOF means the receiver closed
+        # the connection after its last ACK, anything else means the stream is out of sync.
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    @property
+    def connected(self) -> bool:
+        """Whether a kept-alive connection is currently open (it may still turn out stale)."""
+        return self._sock is not None
+
+    def close(self) -> None:
+        if self._sock is None:
+            return
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        self._sock = None
+
+    def _exchange(self, sock: socket.socket, message: bytes) -> tuple[bool, str | None, bool]:
+        """Send one frame and wait for its ACK; returns (ok, error, retry_on_new_connection)."""
+        try:
+            _send_frame(sock, message)
+            ack_chunks: list[bytes] = []
+            while True:
+                chunk = sock.recv(1024)
+                if not chunk:
+                    break
+                ack_chunks.append(chunk)
+                if EB_CR in chunk or b"\x1c" in chunk:
+                    break
+        except TimeoutError:
+            self.close()
+            return False, ACK_TIMEOUT_ERROR, False
+        except OSError as exc:
+            self.close()
+            return False, str(exc), True
+
+        if not ack_chunks:
+            self.close()
+            return False, "connection established but no ACK returned", True
+        return True, None, False
+
+    def _exchange_batch(self, sock: socket.socket, messages: Sequence[bytes]) -> tuple[int, str | None, bool]:
+        """Pipeline frames and count ACKs; returns (acked, error, resend_rest_one_by_one)."""
+        acked = 0
+        try:
+            _send_frames(sock, messages)
+            while acked < len(messages):
+                chunk = sock.recv(1024)
+                if not chunk:
+                    break
+                acked += chunk.count(b"\x1c")
+        except TimeoutError:
+            self.close()
+            return min(acked, len(messages)), ACK_TIMEOUT_ERROR, False
+        except OSError as exc:
+            self.close()
+            return min(acked, len(messages)), str(exc), True
+        if acked < len(messages):
+            # Receivers that answer one frame per connection close after the first ACK.
+            self.close()
+            return acked, "connection closed before every frame was acknowledged", True
+        return len(messages), None, False
+
+    def send_batch_with_error(self, hl7_messages: Sequence[str | bytes]) -> list[tuple[bool, str | None]]:
+        """Send several frames in one write and read their ACKs in order; one result per message.
+
+        Frames the receiver did not acknowledge before closing the connection are resent one
+        at a time, as send_with_error would.
+        """
+        messages = [m.encode("utf-8") if isinstance(m, str) else m for m in hl7_messages]
+        if not messages:
+            return []
+        with self._lock:
+            sock = self._sock
+            if sock is not None and self._is_stale(sock):
+                self.close()
+                sock = None
+            if sock is None:
+                try:
+                    sock = self._connect()
+                except TimeoutError:
+                    return [(False, "connection timed out")] * len(messages)
+                except ConnectionRefusedError:
+                    return [(False, "connection refused")] * len(messages)
+                except OSError as exc:
+                    return [(False, str(exc))] * len(messages)
+            acked, error, resend = self._exchange_batch(sock, messages)
+            results: list[tuple[bool, str | None]] = [(True, None)] * acked
+            if error is not None and not resend:
+                return results + [(False, error)] * (len(messages) - acked)
+            results.extend(self._send_locked(message) for message in messages[acked:])
+            return results
+
+    def send_with_error(self, hl7_message: str | bytes) -> tuple[bool, str | None]:
+        message = hl7_message.encode("utf-8") if isinstance(hl7_message, str) else hl7_message
+        with self._lock:
+            return self._send_locked(message)
+
+    def _send_locked(self, message: bytes) -> tuple[bool, str | None]:
+        sock = self._sock
+        if sock is not None and self._is_stale(sock):
+            self.close()
+            sock = None
+        if sock is not None:
+            ok, error, retry = self._exchange(sock, message)
+            if ok or not retry:
+                return ok, error
+
+        try:
+            sock = self._connect()
+        except TimeoutError:
+            return False, "connection timed out"
+        except ConnectionRefusedError:
+            return False, "connection refused"
+        except OSError as exc:
+            return False, str(exc)
+        ok, error, _ = self._exchange(sock, message)
+        return ok, error
+
+    def send(self, hl7_message: str | bytes) -> bool:
+        ok, _ = self.send_with_error(hl7_message)
+        return ok
+
+
+_POOL: dict[tuple[str, int], MllpClient] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _pooled_client(host: str, port: int, timeout: float) -> MllpClient:
+    with _POOL_LOCK:
+        client = _POOL.get((host, port))
+        if client is None:
+            client = _POOL[(host, port)] = MllpClient(host, port, timeout=timeout)
+    if client.timeout != timeout:
+        # Applied on the next connect; the live socket keeps its timeout until then.
+        client.timeout = timeout
+    return client
+
+
+def close_pooled_connections() -> None:
+    with _POOL_LOCK:
+        clients = list(_POOL.values())
+        _POOL.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_pooled_connections)
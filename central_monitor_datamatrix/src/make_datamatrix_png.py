@@ -1,46 +1,129 @@
 from __future__ import annotations
 
-import argparse
 import json
 import logging
+import sys
 from pathlib import Path
-
-import dm_datamatrix
+from types import SimpleNamespace
 
 logger = logging.getLogger(__name__)
 
 
-def parse_args() -> argparse.Namespace:
+_PARAMS_PRESETS = ("preset20",)
+# auto: libzint in-process, falling back to tool/zint.exe; zint-exe: always tool/zint.exe.
+_BACKENDS = ("auto", "zint-exe")
+
+
+def _parse_argv_fast(argv: list[str]) -> SimpleNamespace | None:
+    """Parse the plain `--cache ... --out ... [--beds N] [--params P] [--backend B] [--optimize]` form.
+
+    Returns None for anything else (help, unknown flags, bad values), leaving usage and error
+    messages to argparse, which is only imported then.
+    """
+    args = SimpleNamespace(cache=[], out=[], beds=6, params="preset20", backend="auto", optimize=False)
+    i = 0
+    while i < len(argv):
+        flag = argv[i]
+        i += 1
+        if flag == "--optimize":
+            args.optimize = True
+        elif flag in ("--cache", "--out"):
+            values = getattr(args, flag[2:])
+            if values:
+                # Repeated: argparse keeps only the last occurrence's paths; let it decide.
+                return None
+            while i < len(argv) and not argv[i].startswith("-"):
+                values.append(argv[i])
+                i += 1
+            if not values:
+                return None
+        elif flag in ("--beds", "--params", "--backend"):
+            if i >= len(argv):
+                return None
+            value = argv[i]
+            i += 1
+            if flag == "--beds":
+                try:
+                    args.beds = int(value)
+                except ValueError:
+                    return None
+            elif flag == "--params" and value in _PARAMS_PRESETS:
+                args.params = value
+            elif flag == "--backend" and value in _BACKENDS:
+                args.backend = value
+            else:
+                return None
+        else:
+            return None
+    if not args.cache or len(args.cache) != len(args.out):
+        return None
+    return args
+
+
+def parse_args(argv: list[str] | None = None) -> SimpleNamespace:
+    argv = sys.argv[1:] if argv is None else argv
+    args = _parse_argv_fast(argv)
+    if args is not None:
+        return args
+
+    import argparse
+
     parser = argparse.ArgumentParser(description="Generate a DataMatrix PNG from monitor_cache.json.")
-    parser.add_argument("--cache", required=True, help="Path to monitor_cache.json")
-    parser.add_argument("--out", required=True, help="Output PNG path")
+    parser.add_argument("--cache", required=True, nargs="+", help="Path(s) to monitor_cache.json")
+    parser.add_argument("--out", required=True, nargs="+", help="Output PNG path(s), one per --cache")
     parser.add_argument("--beds", type=int, default=6, help="Number of beds (default: 6)")
     parser.add_argument(
         "--params",
         default="preset20",
-        choices=["preset20"],
+        choices=list(_PARAMS_PRESETS),
         help="Parameter preset name (default: preset20)",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--backend",
+        default="auto",
+        choices=list(_BACKENDS),
+        help="auto: in-process libzint with zint.exe fallback; zint-exe: always tool/zint.exe (default: auto)",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Recompress the PNG for the smallest file (slower; for PNGs that are kept or shipped)",
+    )
+    args = parser.parse_args(argv)
+    if len(args.cache) != len(args.out):
+        parser.error(f"--cache and --out need the same number of paths ({len(args.cache)} != {len(args.out)})")
+    return args
 
 
 def main() -> int:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     args = parse_args()
+    # Imported after argument parsing so --help and usage errors skip PIL/numpy/zint start-up.
+    import dm_datamatrix
 
-    cache_path = Path(args.cache)
-    out_path = Path(args.out)
+    cache_path = None
+    out_path = None
 
     try:
-        sizes, read_attempt = dm_datamatrix.generate_datamatrix_png_from_cache(
-            cache_path=cache_path,
-            out_path=out_path,
-            beds_count=args.beds,
-        )
-        logger.info("saved DataMatrix PNG: %s", out_path)
-        logger.info("blob size=%d bytes", sizes["blob_size"])
-        logger.info("packet size=%d bytes", sizes["packet_size"])
-        logger.info("cache read attempt=%d", read_attempt)
+        zint_exe = dm_datamatrix.resolve_zint_exe() if args.backend == "zint-exe" else None
+        # Several --cache/--out pairs share one process (and one zint symbol) instead of
+        # paying interpreter and zint start-up per PNG.
+        for cache_arg, out_arg in zip(args.cache, args.out):
+            cache_path = Path(cache_arg)
+            out_path = Path(out_arg)
+            sizes, read_attempt = dm_datamatrix.generate_datamatrix_png_from_cache(
+                cache_path=cache_path,
+                out_path=out_path,
+                beds_count=args.beds,
+                optimize=args.optimize,
+                zint_exe=zint_exe,
+            )
+            logger.info("saved DataMatrix PNG: %s", out_path)
+            logger.info("blob size=%d bytes", sizes["blob_size"])
+            if args.optimize:
+                logger.info("png size=%d bytes", out_path.stat().st_size)
+            logger.info("packet size=%d bytes", sizes["packet_size"])
+            logger.info("cache read attempt=%d", read_attempt)
         return 0
     except FileNotFoundError as exc:
         logger.error("file not found: %s", exc)
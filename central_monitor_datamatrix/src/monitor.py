@@ -1,20 +1,22 @@
 from __future__ import annotations
 
 import argparse
-import json
 import logging
 import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from tkinter import ttk
 
-from PIL import ImageTk
-
+import cache_io
 from dm_codec import encode_payload
 from dm_payload import SeqCounter, make_payload
-from dm_render import render_datamatrix
+from dm_render import render_datamatrix, to_pnm_bytes
 
 logger = logging.getLogger(__name__)
 
+DM_RESULT_POLL_MS = 20
+DM_SIZE_PX = 280
+
 
 class MonitorApp:
     def __init__(self, root: tk.Tk, cache_path: Path, interval_ms: int = 1000) -> None:
@@ -22,7 +24,20 @@ class MonitorApp:
         self.cache_path = cache_path
         self.interval_ms = interval_ms
         self.seq_counter = SeqCounter()
-        self.dm_photo = None
+        # Raw bytes of the cache file behind self._cache. Content is compared rather than
+        # (mtime, size): a same-size rewrite within the filesystem's mtime resolution (FAT, SMB)
+        # would look unchanged, and reading a few KB is far cheaper than parsing it.
+        self._cache_raw: bytes | None = None
+        self._cache: dict = {"beds": {}}
+        self._shown_cache: dict | None = None
+        self._shown_text = ""
+        # DataMatrix payload/encode/render runs on one worker thread; Tk is only touched from
+        # the main loop, which polls the future with after().
+        self._dm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dm-render")
+        self._dm_future: Future[bytes] | None = None
+        self._dm_pending: dict | None = None
+        # Per-bed payload entries keyed by the bed's ts; only touched from the worker thread.
+        self._bed_payload_cache: dict[str, tuple[str, dict | None]] = {}
 
         self.root.title("Central Monitor + DataMatrix")
         self.root.geometry("1200x750")
@@ -31,17 +46,34 @@ class MonitorApp:
         self.text = tk.Text(root, bg="black", fg="#ccffcc", font=("Consolas", 14), relief=tk.FLAT)
         self.text.pack(fill=tk.BOTH, expand=True)
 
-        self.dm_label = ttk.Label(root)
+        # One Tk image for the lifetime of the window, sized up front so the label's slot is laid
+        # out before the first render; each result only reloads its pixels.
+        self.dm_photo = tk.PhotoImage(width=DM_SIZE_PX, height=DM_SIZE_PX)
+        self.dm_label = ttk.Label(root, image=self.dm_photo)
         self.dm_label.place(relx=1.0, rely=1.0, anchor="se", x=-20, y=-20)
 
     def _load_cache(self) -> dict:
-        if not self.cache_path.exists():
+        """Parsed cache; the same object as last time when the file is unchanged."""
+        try:
+            raw = self.cache_path.read_bytes()
+        except FileNotFoundError:
+            if self._cache_raw is not None:
+                self._cache_raw = None
+                self._cache = {"beds": {}}
+            return self._cache
+        except OSError as exc:
+            logger.warning("cache read failed: %s", exc)
             return {"beds": {}}
+        if raw == self._cache_raw:
+            return self._cache
         try:
-            return json.loads(self.cache_path.read_text(encoding="utf-8"))
+            cache = cache_io.loads_json(raw)
         except Exception as exc:
             logger.warning("cache read failed: %s", exc)
             return {"beds": {}}
+        self._cache_raw = raw
+        self._cache = cache
+        return cache
 
     def _update_text(self, cache: dict) -> None:
         lines = [f"Monitor cache ts: {cache.get('ts', '-')}\n", "=" * 90 + "\n"]
@@ -52,24 +84,58 @@ class MonitorApp:
                     f"  - {code:<8} value={vital.get('value')} unit={vital.get('unit', '')} flag={vital.get('flag', '')}\n"
                 )
             lines.append("\n")
+        body = "".join(lines)
+        # Replacing the Text contents repaints the whole widget; skip it when nothing changed.
+        if body == self._shown_text:
+            return
+        self._shown_text = body
         self.text.delete("1.0", tk.END)
-        self.text.insert(tk.END, "".join(lines))
+        self.text.insert(tk.END, body)
 
-    def _update_datamatrix(self, cache: dict) -> None:
+    def _build_datamatrix(self, cache: dict) -> bytes:
+        # Worker thread: no Tk calls here.
         seq = self.seq_counter.next()
-        payload = make_payload(cache, seq=seq)
+        payload = make_payload(cache, seq=seq, bed_cache=self._bed_payload_cache)
         blob = encode_payload(payload)
-        dm_img = render_datamatrix(blob, size_px=280)
-        self.dm_photo = ImageTk.PhotoImage(dm_img)
-        self.dm_label.configure(image=self.dm_photo)
+        dm_img = render_datamatrix(blob, size_px=DM_SIZE_PX)
+        # Hand Tk raw PGM pixels; a PNG encode/decode of a 2-colour bitmap is pure overhead.
+        return to_pnm_bytes(dm_img)
 
-    def refresh(self) -> None:
-        cache = self._load_cache()
-        self._update_text(cache)
+    def _update_datamatrix(self, cache: dict) -> None:
+        if self._dm_future is not None:
+            # A render is in flight; only the newest cache is worth rendering after it.
+            self._dm_pending = cache
+            return
+        self._dm_future = self._dm_pool.submit(self._build_datamatrix, cache)
+        self.root.after(DM_RESULT_POLL_MS, self._poll_datamatrix)
+
+    def _poll_datamatrix(self) -> None:
+        future = self._dm_future
+        if future is None:
+            return
+        if not future.done():
+            self.root.after(DM_RESULT_POLL_MS, self._poll_datamatrix)
+            return
+        self._dm_future = None
         try:
-            self._update_datamatrix(cache)
+            self._apply_datamatrix(future.result())
         except Exception as exc:
             logger.warning("datamatrix render failed: %s", exc)
+        if self._dm_pending is not None:
+            cache, self._dm_pending = self._dm_pending, None
+            self._update_datamatrix(cache)
+
+    def _apply_datamatrix(self, pnm: bytes) -> None:
+        self.dm_photo.configure(data=pnm, format="PPM")
+
+    def refresh(self) -> None:
+        cache = self._load_cache()
+        if cache is self._shown_cache:
+            self.root.after(self.interval_ms, self.refresh)
+            return
+        self._shown_cache = cache
+        self._update_text(cache)
+        self._update_datamatrix(cache)
         self.root.after(self.interval_ms, self.refresh)
 
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from datetime import datetime
 from pathlib import Path
 
@@ -43,7 +44,10 @@ def resolve_run_dir(run_dir: str | Path | None, base: str | Path = "dataset", wo
 def resolve_in_run_dir(path_value: str | Path | None, run_dir: Path) -> Path | None:
     if path_value is None:
         return None
-    path = Path(path_value)
-    if path.is_absolute():
-        return path
-    return run_dir / path
+    if isinstance(path_value, Path):
+        return path_value if path_value.is_absolute() else run_dir / path_value
+    # Plain strings (argparse values) are checked with os.path and joined once, without
+    # building an intermediate Path for the relative part.
+    if os.path.isabs(path_value):
+        return Path(path_value)
+    return run_dir / path_value
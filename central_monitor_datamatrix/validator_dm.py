@@ -1,22 +1,28 @@
 from __future__ import annotations
 
 import argparse
+import csv
 import json
 import math
 import re
-from bisect import bisect_left
 from collections import Counter, deque
+from contextlib import closing
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 import sys
 from statistics import median
 from typing import Any, Iterable
 
+import numpy as np
+
 BASE_DIR = Path(__file__).resolve().parent
 SRC_DIR = BASE_DIR / "src"
 if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
+import cache_io
 import paths as run_paths
 
 BED_IDS = [f"BED{i:02d}" for i in range(1, 7)]
@@ -41,6 +47,29 @@ DEFAULT_CONFIG = {
     },
 }
 
+# Status codes used in the packed (records, beds, fields) arrays; index into STATUS_NAMES.
+STATUS_OK, STATUS_MISSING, STATUS_INVALID, STATUS_TRUTH_MISSING = range(4)
+STATUS_NAMES = ("ok", "missing", "invalid", "truth_missing")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+NON_ROUNDED_FIELDS = {"TSKIN", "TRECT"}
+
+# JSONL inputs run to hundreds of MB: read through a 1 MiB buffer and hand the detailed
+# output to the OS in ~64 KiB batches instead of one small write per row.
+IO_BUFFER_SIZE = 1 << 20
+OUTPUT_FLUSH_BYTES = 64 * 1024
+# Columns of the detailed results, in output order, with the Arrow type used for parquet.
+RESULT_COLUMNS = (
+    ("truth_timestamp", "string"), ("delta_t_ms", "float64"), ("matched_by", "string"),
+    ("bed", "string"), ("field", "string"), ("decoded_at_ms", "int64"), ("timestamp_ms", "int64"),
+    ("packet_id", "int64"), ("cache_epoch_ms", "int64"), ("source_packet_id", "int64"),
+    ("truth_epoch_ms", "int64"), ("truth_packet_id", "int64"), ("truth_ts", "string"),
+    ("source", "string"), ("joined_truth_packet_id", "int64"), ("decode_ok", "bool"),
+    ("crc_ok", "bool"), ("decoded_value", "float64"), ("truth_value", "float64"),
+    ("abs_error", "float64"), ("match", "bool"), ("within_tol_match", "bool"), ("status", "string"),
+)
+OUTPUT_FORMATS = ("jsonl", "csv", "parquet")
+PARQUET_BATCH_ROWS = 64 * 1024
+
 FILENAME_TS_RE = re.compile(r"(\d{8})_(\d{6})_(\d{3})")
 NUM_RE = re.compile(r"[-+]?\d*\.?\d+")
 
@@ -58,7 +87,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--monitor-cache-dir", help="Directory containing monitor cache snapshots (legacy)")
     parser.add_argument("--generator-results", "--generator", dest="generator_results", help="Generator truth JSONL path (default: run_dir/generator_results.jsonl)")
     parser.add_argument("--cache-snapshots", help="cache_snapshots.jsonl path")
-    parser.add_argument("--out", default="dm_validation_results.jsonl", help="Detailed result JSONL path (relative path is resolved under --run-dir)")
+    parser.add_argument("--out", help="Detailed result path (relative path is resolved under --run-dir). Default: dm_validation_results.<output-format>")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="jsonl", help="Detailed result format; csv and parquet write the column names once instead of on every row")
     parser.add_argument("--summary-out", default="dm_validation_summary.json", help="Summary JSON path (relative path is resolved under --run-dir)")
     parser.add_argument("--last", type=int, help="Evaluate only the last N decoded records")
     parser.add_argument("--tolerance-sec", type=float, default=2.0, help="Max timestamp delta for truth matching")
@@ -69,8 +99,7 @@ def parse_args() -> argparse.Namespace:
 
 def load_or_create_config(path: Path) -> dict[str, Any]:
     if path.exists():
-        with path.open("r", encoding="utf-8") as f:
-            cfg = json.load(f)
+        cfg = cache_io.load_json(path)
         print(f"[INFO] Loaded config: {path}")
         return cfg
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -80,12 +109,22 @@ def load_or_create_config(path: Path) -> dict[str, Any]:
     return DEFAULT_CONFIG
 
 
+# Decoded logs repeat the same timestamp strings across records (several captures per second),
+# and datetime objects are immutable, so parsed results are memoised by their source text.
+TIMESTAMP_CACHE_SIZE = 8192
+
+
 def parse_timestamp(value: Any) -> datetime | None:
     if not value or not isinstance(value, str):
         return None
     txt = value.strip()
     if not txt:
         return None
+    return _parse_iso_timestamp(txt)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_iso_timestamp(txt: str) -> datetime | None:
     if txt.endswith("Z"):
         txt = txt[:-1] + "+00:00"
     try:
@@ -100,13 +139,27 @@ def infer_timestamp_from_filename(path_text: str | None) -> datetime | None:
     m = FILENAME_TS_RE.search(path_text)
     if not m:
         return None
-    d, t, ms = m.groups()
+    return _parse_filename_timestamp(*m.groups())
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_filename_timestamp(d: str, t: str, ms: str) -> datetime | None:
     try:
         return datetime.strptime(f"{d}_{t}_{ms}", "%Y%m%d_%H%M%S_%f")
     except ValueError:
         return None
 
 
+def _is_plain_decimal(text: str) -> bool:
+    """True for an optionally signed ASCII decimal such as "72", "-3" or "98.5".
+
+    float() always accepts these, and gives the same value NUM_RE would extract, so the
+    common clean case needs neither the regex nor a try/except around float().
+    """
+    body = text[1:] if text[:1] in ("+", "-") else text
+    return body.isascii() and body.replace(".", "", 1).isdigit()
+
+
 def normalize_number(value: Any) -> tuple[float | None, str]:
     if value is None:
         return None, "missing"
@@ -121,6 +174,10 @@ def normalize_number(value: Any) -> tuple[float | None, str]:
         text = value.strip()
         if not text:
             return None, "missing"
+        if _is_plain_decimal(text):
+            f = float(text)
+            # Only a few hundred digits can overflow; there is no NaN spelling here.
+            return (None, "missing") if math.isinf(f) else (f, "ok")
         m = NUM_RE.search(text)
         if not m:
             return None, "invalid"
@@ -146,6 +203,10 @@ def normalize_epoch_ms(value: Any) -> int | None:
         text = value.strip()
         if not text:
             return None
+        if _is_plain_decimal(text):
+            f = float(text)
+            return None if math.isinf(f) else int(round(f))
+        # Exponents, "nan"/"inf" spellings and digit separators still go through float().
         try:
             f = float(text)
             if math.isnan(f) or math.isinf(f):
@@ -165,14 +226,23 @@ def normalize_packet_id(value: Any) -> int | None:
         return None
 
 
+def _loads_line(text: str) -> Any:
+    try:
+        return cache_io.loads_json(text)
+    except json.JSONDecodeError:
+        # orjson is strict (no NaN/Infinity literals, 64-bit ints); give the stdlib parser,
+        # which the decode apps write with, the final say.
+        return json.loads(text)
+
+
 def iter_jsonl(path: Path) -> Iterable[dict[str, Any]]:
-    with path.open("r", encoding="utf-8") as f:
+    with path.open("r", encoding="utf-8", buffering=IO_BUFFER_SIZE) as f:
         for line_no, line in enumerate(f, 1):
             text = line.strip()
             if not text:
                 continue
             try:
-                data = json.loads(text)
+                data = _loads_line(text)
             except json.JSONDecodeError as exc:
                 print(f"[WARN] JSON decode error at {path}:{line_no}: {exc}")
                 continue
@@ -180,54 +250,170 @@ def iter_jsonl(path: Path) -> Iterable[dict[str, Any]]:
                 yield data
 
 
-def tail_jsonl(path: Path, last_n: int | None) -> list[dict[str, Any]]:
+def _dumps_row(row: dict[str, Any]) -> bytes:
+    """One JSONL line as UTF-8 bytes."""
+    try:
+        return cache_io.dumps_json(row) + b"\n"
+    except TypeError:
+        # Values orjson refuses (e.g. ints beyond 64 bits passed through from the input).
+        return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class JsonlResultWriter:
+    """Detailed results as one JSON object per line."""
+
+    def __init__(self, path: Path) -> None:
+        self._f = path.open("wb", buffering=IO_BUFFER_SIZE)
+        self._buf = bytearray()
+
+    def write_row(self, row: dict[str, Any]) -> None:
+        self._buf += _dumps_row(row)
+        if len(self._buf) >= OUTPUT_FLUSH_BYTES:
+            self._f.write(self._buf)
+            self._buf.clear()
+
+    def close(self) -> None:
+        self._f.write(self._buf)
+        self._f.close()
+
+
+class CsvResultWriter:
+    """Detailed results as CSV with a RESULT_COLUMNS header; None is written as an empty cell."""
+
+    def __init__(self, path: Path) -> None:
+        self._f = path.open("w", encoding="utf-8", newline="", buffering=IO_BUFFER_SIZE)
+        self._writer = csv.writer(self._f)
+        self._writer.writerow([name for name, _ in RESULT_COLUMNS])
+
+    def write_row(self, row: dict[str, Any]) -> None:
+        # Rows are built with their keys in RESULT_COLUMNS order.
+        self._writer.writerow(row.values())
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ParquetResultWriter:
+    """Detailed results as a parquet file written in PARQUET_BATCH_ROWS row groups (needs pyarrow)."""
+
+    def __init__(self, path: Path) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        types = {"string": pa.string(), "float64": pa.float64(), "int64": pa.int64(), "bool": pa.bool_()}
+        self._schema = pa.schema([(name, types[type_name]) for name, type_name in RESULT_COLUMNS])
+        self._string_columns = {name for name, type_name in RESULT_COLUMNS if type_name == "string"}
+        self._writer = pq.ParquetWriter(str(path), self._schema)
+        self._columns: dict[str, list[Any]] = {name: [] for name, _ in RESULT_COLUMNS}
+        self._rows = 0
+
+    def write_row(self, row: dict[str, Any]) -> None:
+        columns = self._columns
+        for name, value in row.items():
+            columns[name].append(value)
+        self._rows += 1
+        if self._rows >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        for name in self._string_columns:
+            # truth_ts / source are passed through from the decoded log and may not be strings.
+            self._columns[name] = [v if v is None or isinstance(v, str) else str(v) for v in self._columns[name]]
+        self._writer.write_table(self._pa.Table.from_pydict(self._columns, schema=self._schema))
+        self._columns = {name: [] for name, _ in RESULT_COLUMNS}
+        self._rows = 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+_RESULT_WRITERS = {"jsonl": JsonlResultWriter, "csv": CsvResultWriter, "parquet": ParquetResultWriter}
+
+
+def iter_tail(path: Path, last_n: int | None) -> Iterable[dict[str, Any]]:
+    """Rows of a JSONL file, or only the last last_n of them, streamed without building a list.
+
+    For last_n only the trailing raw lines are kept and parsed. If any of those is not a JSON
+    object the file is re-read the slow way, so the result is always the last last_n valid rows.
+    """
     if not last_n or last_n <= 0:
-        return list(iter_jsonl(path))
-    q: deque[dict[str, Any]] = deque(maxlen=last_n)
-    for row in iter_jsonl(path):
-        q.append(row)
-    return list(q)
+        yield from iter_jsonl(path)
+        return
+    with path.open("r", encoding="utf-8", buffering=IO_BUFFER_SIZE) as f:
+        tail: deque[str] = deque((text for text in map(str.strip, f) if text), maxlen=last_n)
+    rows: list[dict[str, Any]] = []
+    for text in tail:
+        try:
+            data = _loads_line(text)
+        except json.JSONDecodeError:
+            break
+        if not isinstance(data, dict):
+            break
+        rows.append(data)
+    else:
+        yield from rows
+        return
+    yield from deque(iter_jsonl(path), maxlen=last_n)
+
+
+# Truth files are normally written in time order; the loaders only sort when they saw a row
+# go backwards (the sort is stable, so an in-order list needs no sort at all).
+_EPOCH_KEY = itemgetter("epoch_ms")
 
 
 def load_truth_generator_jsonl(path: Path) -> list[dict[str, Any]]:
     rows: list[dict[str, Any]] = []
+    in_order = True
     for row in iter_jsonl(path):
         epoch_ms = normalize_epoch_ms(row.get("epoch_ms"))
         if epoch_ms is None:
             print("[WARN] truth(generator_jsonl) row missing valid epoch_ms, skipped")
             continue
+        if rows and epoch_ms < rows[-1]["epoch_ms"]:
+            in_order = False
         rows.append({
             "epoch_ms": epoch_ms,
             "packet_id": normalize_packet_id(row.get("packet_id")),
             "timestamp_text": row.get("ts"),
             "beds": row.get("beds", {}),
         })
-    rows.sort(key=lambda x: x["epoch_ms"])
+    if not in_order:
+        rows.sort(key=_EPOCH_KEY)
     return rows
 
 
 def load_truth_cache_snapshot_jsonl(path: Path) -> list[dict[str, Any]]:
     rows: list[dict[str, Any]] = []
+    in_order = True
     for row in iter_jsonl(path):
         epoch_ms = normalize_epoch_ms(row.get("epoch_ms"))
         if epoch_ms is None:
             print("[WARN] truth(cache_snapshot_jsonl) row missing valid epoch_ms, skipped")
             continue
+        if rows and epoch_ms < rows[-1]["epoch_ms"]:
+            in_order = False
         rows.append({
             "epoch_ms": epoch_ms,
             "packet_id": normalize_packet_id(row.get("packet_id")),
             "timestamp_text": row.get("ts"),
             "beds": row.get("beds", {}),
         })
-    rows.sort(key=lambda x: x["epoch_ms"])
+    if not in_order:
+        rows.sort(key=_EPOCH_KEY)
     return rows
 
 
 def load_truth_cache(cache_dir: Path) -> list[dict[str, Any]]:
     rows: list[dict[str, Any]] = []
+    in_order = True
     for path in sorted(cache_dir.glob("*.json")):
         try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
+            # One read of the whole file, parsed from bytes (no text decode layer).
+            payload = cache_io.load_json(path)
         except Exception as exc:
             print(f"[WARN] Failed to read cache file {path}: {exc}")
             continue
@@ -242,16 +428,28 @@ def load_truth_cache(cache_dir: Path) -> list[dict[str, Any]]:
                 epoch_ms = int(round(ts.timestamp() * 1000))
         if epoch_ms is None:
             continue
+        if rows and epoch_ms < rows[-1]["epoch_ms"]:
+            in_order = False
         rows.append({"epoch_ms": epoch_ms, "packet_id": normalize_packet_id(payload.get("packet_id")), "timestamp_text": payload.get("ts"), "beds": payload.get("beds", {})})
-    rows.sort(key=lambda x: x["epoch_ms"])
+    if not in_order:
+        rows.sort(key=_EPOCH_KEY)
     return rows
 
 
 def extract_truth_value(record: dict[str, Any], bed: str, field: str) -> Any:
+    bed_data = truth_bed_data(record, bed)
+    if bed_data is None:
+        return None
+    return extract_truth_bed_value(bed_data, field)
+
+
+def truth_bed_data(record: dict[str, Any], bed: str) -> dict[str, Any] | None:
     beds = record.get("beds", {}) if isinstance(record, dict) else {}
     bed_data = beds.get(bed, {}) if isinstance(beds, dict) else {}
-    if not isinstance(bed_data, dict):
-        return None
+    return bed_data if isinstance(bed_data, dict) else None
+
+
+def extract_truth_bed_value(bed_data: dict[str, Any], field: str) -> Any:
     vitals = bed_data.get("vitals", {})
     if not isinstance(vitals, dict):
         return bed_data.get(field)
@@ -261,6 +459,50 @@ def extract_truth_value(record: dict[str, Any], bed: str, field: str) -> Any:
     return fobj
 
 
+def truth_bed_values(bed_data: dict[str, Any]) -> list[Any]:
+    """extract_truth_bed_value for every field in VITAL_ORDER, probing the bed layout once."""
+    vitals = bed_data.get("vitals", {})
+    if not isinstance(vitals, dict):
+        return [bed_data.get(field) for field in VITAL_ORDER]
+    return [fobj.get("value") if isinstance(fobj, dict) else fobj for fobj in map(vitals.get, VITAL_ORDER)]
+
+
+def decoded_bed_values(bed_data: dict[str, Any]) -> list[Any]:
+    """extract_decoded_value for every field in VITAL_ORDER, probing the bed layout once.
+
+    Decoded beds come as flat fields, "params" and/or "vitals"; the containers are looked up
+    once per bed and the per-field precedence is the same as extract_decoded_value.
+    """
+    params = bed_data.get("params")
+    if not isinstance(params, dict):
+        params = None
+    vitals = bed_data.get("vitals")
+    if not isinstance(vitals, dict):
+        vitals = None
+    if params is None and vitals is None:
+        return [bed_data.get(field) for field in VITAL_ORDER]
+    values: list[Any] = []
+    for field in VITAL_ORDER:
+        if field in bed_data:
+            values.append(bed_data.get(field))
+            continue
+        if params is not None:
+            pobj = params.get(field)
+            if isinstance(pobj, dict):
+                if "value" in pobj:
+                    values.append(pobj.get("value"))
+                    continue
+            elif pobj is not None:
+                values.append(pobj)
+                continue
+        if vitals is not None:
+            vobj = vitals.get(field)
+            values.append(vobj.get("value") if isinstance(vobj, dict) else vobj)
+        else:
+            values.append(None)
+    return values
+
+
 def extract_decoded_value(bed_data: dict[str, Any], field: str) -> Any:
     if not isinstance(bed_data, dict):
         return None
@@ -283,64 +525,208 @@ def extract_decoded_value(bed_data: dict[str, Any], field: str) -> Any:
     return None
 
 
-def pick_truth(
-    decoded_packet_id: int | None,
-    decoded_timestamp_ms: int | None,
-    decoded_truth_epoch_ms: int | None,
+def pick_truths(
+    decoded_packet_ids: list[int | None],
+    decoded_timestamps_ms: list[int | None],
+    decoded_truth_epochs_ms: list[int | None],
+    decoded_time_sources: list[str],
     truth_rows: list[dict[str, Any]],
-    truth_by_epoch: dict[int, dict[str, Any]] | None,
     tolerance_sec: float,
-    decoded_time_source: str,
     truth_mode: str,
-) -> tuple[dict[str, Any] | None, float | None, str]:
+) -> tuple[np.ndarray, list[float | None], list[str]]:
+    """Match every decoded record to a truth row at once.
+
+    Returns the truth_rows index per record (-1 when unmatched), the delta (truth - decoded, ms)
+    and the matched_by key. Precedence per record: exact truth_epoch_ms (generator_jsonl),
+    then the first truth row with the same packet_id, then the nearest epoch_ms within
+    tolerance_sec (ties go to the later row).
+    """
+    count = len(decoded_packet_ids)
+    truth_idx = np.full(count, -1, dtype=np.int64)
+    deltas: list[float | None] = [None] * count
+    matched_by: list[str] = ["none"] * count
     if not truth_rows:
-        return None, None, "none"
-
-    if truth_mode == "generator_jsonl" and decoded_truth_epoch_ms is not None and truth_by_epoch is not None:
-        direct = truth_by_epoch.get(decoded_truth_epoch_ms)
-        if direct is not None:
-            return direct, 0.0, "truth_epoch_ms"
-        return None, None, "truth_epoch_ms"
-
-    if decoded_packet_id is not None:
-        for row in truth_rows:
-            if normalize_packet_id(row.get("packet_id")) == decoded_packet_id:
-                delta = None
-                if decoded_timestamp_ms is not None:
-                    delta = float(row["epoch_ms"]) - float(decoded_timestamp_ms)
-                return row, delta, "packet_id"
-
-    if decoded_timestamp_ms is None:
-        return None, None, "none"
-
-    truth_ts = [float(r["epoch_ms"]) for r in truth_rows]
-    target = float(decoded_timestamp_ms)
-    idx = bisect_left(truth_ts, target)
-    candidates: list[tuple[float, int]] = []
-    if idx < len(truth_rows):
-        candidates.append((abs(truth_ts[idx] - target), idx))
-    if idx - 1 >= 0:
-        candidates.append((abs(truth_ts[idx - 1] - target), idx - 1))
-    if not candidates:
-        return None, None, "none"
-
-    _, best_i = min(candidates, key=lambda x: x[0])
-    delta = truth_ts[best_i] - target
-    if abs(delta) > tolerance_sec * 1000.0:
-        return None, None, "none"
-
-    matched_by = "epoch_ms" if decoded_time_source in {"truth_epoch_ms", "dm_epoch_ms", "cache_epoch_ms", "timestamp_ms"} else "fallback_time"
-    return truth_rows[best_i], delta, matched_by
-
-
-def percentile(values: list[float], p: float) -> float | None:
-    if not values:
+        return truth_idx, deltas, matched_by
+
+    truth_ts = np.array([float(r["epoch_ms"]) for r in truth_rows], dtype=np.float64)
+    index_by_epoch: dict[int, int] | None = None
+    if truth_mode == "generator_jsonl":
+        index_by_epoch = {int(row["epoch_ms"]): i for i, row in enumerate(truth_rows)}
+    index_by_packet_id: dict[int, int] = {}
+    for i, row in enumerate(truth_rows):
+        packet_id = normalize_packet_id(row.get("packet_id"))
+        if packet_id is not None:
+            index_by_packet_id.setdefault(packet_id, i)
+
+    by_time: list[int] = []
+    for n in range(count):
+        truth_epoch_ms = decoded_truth_epochs_ms[n]
+        timestamp_ms = decoded_timestamps_ms[n]
+        if index_by_epoch is not None and truth_epoch_ms is not None:
+            matched_by[n] = "truth_epoch_ms"
+            direct = index_by_epoch.get(truth_epoch_ms)
+            if direct is not None:
+                truth_idx[n] = direct
+                deltas[n] = 0.0
+            continue
+        packet_id = decoded_packet_ids[n]
+        if packet_id is not None and packet_id in index_by_packet_id:
+            i = index_by_packet_id[packet_id]
+            truth_idx[n] = i
+            matched_by[n] = "packet_id"
+            if timestamp_ms is not None:
+                deltas[n] = float(truth_rows[i]["epoch_ms"]) - float(timestamp_ms)
+            continue
+        if timestamp_ms is not None:
+            by_time.append(n)
+
+    if by_time:
+        rec = np.array(by_time, dtype=np.int64)
+        target = np.array([float(decoded_timestamps_ms[n]) for n in by_time], dtype=np.float64)
+        idx = np.searchsorted(truth_ts, target, side="left")
+        right = np.minimum(idx, len(truth_ts) - 1)
+        left = np.maximum(idx - 1, 0)
+        right_diff = np.abs(truth_ts[right] - target)
+        left_diff = np.abs(truth_ts[left] - target)
+        # Past the end only the left neighbour exists; at the start only the right one.
+        best = np.where((idx < len(truth_ts)) & ((idx == 0) | (right_diff <= left_diff)), right, left)
+        delta = truth_ts[best] - target
+        within = np.abs(delta) <= tolerance_sec * 1000.0
+        truth_idx[rec[within]] = best[within]
+        for n, d in zip(rec[within].tolist(), delta[within].tolist()):
+            deltas[n] = d
+            source = decoded_time_sources[n]
+            matched_by[n] = "epoch_ms" if source in {"truth_epoch_ms", "dm_epoch_ms", "cache_epoch_ms", "timestamp_ms"} else "fallback_time"
+    return truth_idx, deltas, matched_by
+
+
+def _pack_values(bed_rows: Iterable[list[dict[str, Any] | None]], extract: Any) -> tuple[np.ndarray, np.ndarray]:
+    """Normalize every (record, bed, field) value once into float64 values + uint8 status codes.
+
+    bed_rows yields, per record, the already-resolved data of each bed in BED_IDS order (None for
+    an absent bed); extract(bed_data) returns its raw values in VITAL_ORDER. It is consumed once,
+    so it may be a generator.
+    """
+    nan = math.nan
+    fields_count = len(VITAL_ORDER)
+    absent_values = [nan] * fields_count
+    absent_status = bytes([STATUS_MISSING]) * fields_count
+    values: list[float] = []
+    status = bytearray()
+    # Strings repeat heavily ("72", "98.5"), so each distinct one is normalized once.
+    normalized: dict[str, tuple[float, int]] = {}
+    records = 0
+    for beds in bed_rows:
+        records += 1
+        for bed_data in beds:
+            if bed_data is None:
+                values.extend(absent_values)
+                status += absent_status
+                continue
+            for raw in extract(bed_data):
+                raw_type = type(raw)
+                if raw_type is float or raw_type is int:
+                    # normalize_number inlined for plain numbers; f - f is 0.0 unless f is NaN/inf.
+                    f = float(raw)
+                    if f - f == 0.0:
+                        values.append(f)
+                        status.append(STATUS_OK)
+                    else:
+                        values.append(nan)
+                        status.append(STATUS_MISSING)
+                    continue
+                if raw_type is str:
+                    cached = normalized.get(raw)
+                    if cached is None:
+                        value, value_status = normalize_number(raw)
+                        cached = normalized[raw] = (nan, _STATUS_CODES[value_status]) if value is None else (value, STATUS_OK)
+                    values.append(cached[0])
+                    status.append(cached[1])
+                    continue
+                value, value_status = normalize_number(raw)
+                if value is None:
+                    values.append(nan)
+                    status.append(_STATUS_CODES[value_status])
+                else:
+                    values.append(value)
+                    status.append(STATUS_OK)
+    shape = (records, len(BED_IDS), fields_count)
+    return (
+        np.array(values, dtype=np.float64).reshape(shape),
+        np.frombuffer(bytes(status), dtype=np.uint8).reshape(shape).copy(),
+    )
+
+
+def _field_constants(config: dict[str, Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-field eps, range bounds, has-range flag and round-before-compare flag, indexed like VITAL_ORDER."""
+    eps_map = config.get("field_epsilons", {})
+    integer_fields = set(config.get("integer_preferred_fields", []))
+    vital_ranges = config.get("vital_ranges", {})
+    eps = np.zeros(len(VITAL_ORDER), dtype=np.float64)
+    lo = np.zeros(len(VITAL_ORDER), dtype=np.float64)
+    hi = np.zeros(len(VITAL_ORDER), dtype=np.float64)
+    has_range = np.zeros(len(VITAL_ORDER), dtype=bool)
+    rounded = np.zeros(len(VITAL_ORDER), dtype=bool)
+    for k, field in enumerate(VITAL_ORDER):
+        try:
+            eps[k] = float(eps_map.get(field, 0.0))
+        except (TypeError, ValueError):
+            eps[k] = 0.0
+        range_cfg = vital_ranges.get(field)
+        if isinstance(range_cfg, list) and len(range_cfg) == 2 and isinstance(range_cfg[0], (int, float)) and isinstance(range_cfg[1], (int, float)):
+            lo[k], hi[k] = float(range_cfg[0]), float(range_cfg[1])
+            has_range[k] = True
+        rounded[k] = field in integer_fields and field not in NON_ROUNDED_FIELDS
+    return eps, lo, hi, has_range, rounded
+
+
+def _score_cells(
+    dec: np.ndarray,
+    dec_status: np.ndarray,
+    truth: np.ndarray,
+    truth_status: np.ndarray,
+    eps: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    has_range: np.ndarray,
+    rounded: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Final status, ok mask, abs error, match and within-tolerance for packed (records, beds, fields) cells.
+
+    The truth status wins over the decoded status, and an out-of-range decoded value turns an
+    otherwise ok cell invalid. Work happens in place on a few full-size buffers; the rounded
+    comparison only touches the rounded fields' columns.
+    """
+    status = truth_status.copy()
+    np.copyto(status, dec_status, where=truth_status == STATUS_OK)
+    with np.errstate(invalid="ignore"):
+        bad = np.less(dec, lo)
+        bad |= np.greater(dec, hi)
+        bad &= has_range
+        bad &= status == STATUS_OK
+        status[bad] = STATUS_INVALID
+        ok = np.equal(status, STATUS_OK, out=bad)
+
+        abs_err = np.subtract(dec, truth)
+        np.abs(abs_err, out=abs_err)
+        match = np.equal(dec, truth)
+        cols = np.flatnonzero(rounded)
+        if cols.size:
+            match[..., cols] = np.rint(dec[..., cols]) == np.rint(truth[..., cols])
+        match &= ok
+        within = np.less_equal(abs_err, eps)
+        within &= ok
+    return status, ok, abs_err, match, within
+
+
+def percentile(values: list[float] | np.ndarray, p: float) -> float | None:
+    if not len(values):
         return None
     if p <= 0:
         return min(values)
     if p >= 100:
         return max(values)
-    xs = sorted(values)
+    xs = np.sort(values).tolist() if isinstance(values, np.ndarray) else sorted(values)
     rank = (len(xs) - 1) * (p / 100.0)
     lo = int(math.floor(rank))
     hi = int(math.ceil(rank))
@@ -350,12 +736,21 @@ def percentile(values: list[float], p: float) -> float | None:
     return xs[lo] * (1.0 - frac) + xs[hi] * frac
 
 
-def safe_mean(values: list[float]) -> float | None:
-    return (sum(values) / len(values)) if values else None
+def safe_mean(values: list[float] | np.ndarray) -> float | None:
+    if not len(values):
+        return None
+    if isinstance(values, np.ndarray):
+        # cumsum adds left to right like sum() (np.sum is pairwise), so the mean is bit-identical.
+        return float(np.cumsum(values)[-1]) / len(values)
+    return sum(values) / len(values)
 
 
-def safe_median(values: list[float]) -> float | None:
-    return float(median(values)) if values else None
+def safe_median(values: list[float] | np.ndarray) -> float | None:
+    if not len(values):
+        return None
+    if isinstance(values, np.ndarray):
+        return float(np.median(values))
+    return float(median(values))
 
 
 def print_debug_one(truth_row: dict[str, Any], decoded_beds: dict[str, Any]) -> None:
@@ -377,7 +772,7 @@ def main() -> None:
     print(f"[INFO] run_dir={run_dir}")
 
     decoded_path = run_paths.resolve_in_run_dir(args.decoded_results, run_dir)
-    out_path = run_paths.resolve_in_run_dir(args.out, run_dir)
+    out_path = run_paths.resolve_in_run_dir(args.out or f"dm_validation_results.{args.output_format}", run_dir)
     summary_path = run_paths.resolve_in_run_dir(args.summary_out, run_dir)
     config_path = run_paths.resolve_in_run_dir(args.config, run_dir)
 
@@ -404,11 +799,14 @@ def main() -> None:
         raise ValueError("--cache-snapshots is required when --truth-mode=cache_snapshot_jsonl")
     if args.truth_mode == "cache" and monitor_cache_dir_path is None:
         raise ValueError("--monitor-cache-dir is required when --truth-mode=cache")
+    if args.output_format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as exc:
+            raise RuntimeError("--output-format parquet requires pyarrow (pip install pyarrow)") from exc
 
     config = load_or_create_config(config_path)
-    eps_map = config.get("field_epsilons", {})
-    integer_fields = set(config.get("integer_preferred_fields", []))
-    vital_ranges = config.get("vital_ranges", {})
+    eps_arr, lo_arr, hi_arr, has_range_arr, rounded_arr = _field_constants(config)
 
     if args.truth_mode == "cache_snapshot_jsonl":
         truth_rows = load_truth_cache_snapshot_jsonl(cache_snapshots_path)
@@ -423,53 +821,53 @@ def main() -> None:
         truth_rows = load_truth_generator_jsonl(generator_results_path)
         print("[INFO] truth-mode=generator is treated as generator_jsonl compatibility mode.")
 
-    truth_by_epoch: dict[int, dict[str, Any]] | None = None
-    if args.truth_mode == "generator_jsonl":
-        truth_by_epoch = {int(row["epoch_ms"]): row for row in truth_rows}
-
     print(f"[INFO] Loaded truth rows: {len(truth_rows)}")
-    decoded_rows = tail_jsonl(decoded_path, args.last)
-    print(f"[INFO] Loaded decoded rows: {len(decoded_rows)}")
+    decoded_rows = iter_tail(decoded_path, args.last)
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
     summary_path.parent.mkdir(parents=True, exist_ok=True)
 
-    total_expected = missing_count = invalid_count = matched_count = within_tol_matched_count = evaluated_count = 0
-    abs_errors: list[float] = []
-    decoded_record_count = len(decoded_rows)
-    decode_success_record_count = crc_fail_record_count = truth_missing_record_count = 0
+    truth_missing_record_count = 0
     delta_t_values: list[float] = []
     matched_by_counter: Counter[str] = Counter()
     decoded_time_source_counter: Counter[str] = Counter()
     packet_id_join_success_count = 0
-    evaluated_on_success = matched_on_success = 0
-    abs_errors_on_success: list[float] = []
-    per_field: dict[str, dict[str, Any]] = {f: {"count": 0, "evaluated": 0, "matched": 0, "within_tol_matched": 0, "abs_errors": []} for f in VITAL_ORDER}
     debug_done = False
 
-    with out_path.open("w", encoding="utf-8") as out_f:
-        for rec_idx, rec in enumerate(decoded_rows, 1):
+    # Pass 1: per-record join keys and record-level output columns, streamed: each record's bed
+    # values go straight into the packed arrays, so the decoded dicts are not kept until scoring.
+    record_infos: list[tuple[Any, ...]] = []
+    decoded_packet_ids: list[int | None] = []
+    decoded_timestamps_ms: list[int | None] = []
+    decoded_truth_epochs_ms: list[int | None] = []
+    decoded_time_sources: list[str] = []
+    success_flags: list[bool] = []
+    # --debug-one prints the decoded beds of the first matched record, which is only known later.
+    debug_beds: list[dict[str, Any]] = []
+
+    def scan_records() -> Iterable[list[dict[str, Any] | None]]:
+        for rec in decoded_rows:
             decode_ok = bool(rec.get("decode_ok"))
             crc_ok = bool(rec.get("crc_ok"))
-            is_success_record = decode_ok and crc_ok
-            if is_success_record:
-                decode_success_record_count += 1
-            if not crc_ok:
-                crc_fail_record_count += 1
+            success_flags.append(decode_ok and crc_ok)
 
             decoded_beds = rec.get("beds") if isinstance(rec.get("beds"), dict) else {}
-            decoded_packet_id = normalize_packet_id(rec.get("truth_packet_id"))
+            source_packet_id = normalize_packet_id(rec.get("source_packet_id"))
+            truth_packet_id = normalize_packet_id(rec.get("truth_packet_id"))
+            decoded_packet_id = truth_packet_id
             if decoded_packet_id is None:
-                decoded_packet_id = normalize_packet_id(rec.get("source_packet_id"))
+                decoded_packet_id = source_packet_id
             if decoded_packet_id is None:
                 decoded_packet_id = normalize_packet_id(rec.get("packet_id"))
 
             decoded_truth_epoch_ms = normalize_epoch_ms(rec.get("truth_epoch_ms"))
+            cache_epoch_ms = normalize_epoch_ms(rec.get("cache_epoch_ms"))
+            decoded_at_ms = normalize_epoch_ms(rec.get("decoded_at_ms"))
 
             decoded_timestamp_ms = decoded_truth_epoch_ms
             decoded_time_source = "truth_epoch_ms" if decoded_timestamp_ms is not None else "none"
             if decoded_timestamp_ms is None:
-                decoded_timestamp_ms = normalize_epoch_ms(rec.get("cache_epoch_ms"))
+                decoded_timestamp_ms = cache_epoch_ms
                 if decoded_timestamp_ms is not None:
                     decoded_time_source = "cache_epoch_ms"
             if decoded_timestamp_ms is None:
@@ -481,7 +879,7 @@ def main() -> None:
                 if decoded_timestamp_ms is not None:
                     decoded_time_source = "timestamp_ms"
             if decoded_timestamp_ms is None:
-                decoded_timestamp_ms = normalize_epoch_ms(rec.get("decoded_at_ms"))
+                decoded_timestamp_ms = decoded_at_ms
                 if decoded_timestamp_ms is not None:
                     decoded_time_source = "decoded_at_ms"
             if decoded_timestamp_ms is None:
@@ -490,134 +888,194 @@ def main() -> None:
                     decoded_timestamp_ms = int(round(dts.timestamp() * 1000))
                     decoded_time_source = "record_timestamp"
             decoded_time_source_counter[decoded_time_source] += 1
-
-            nearest_truth, delta_t, matched_by = pick_truth(
-                decoded_packet_id,
-                decoded_timestamp_ms,
-                decoded_truth_epoch_ms,
-                truth_rows,
-                truth_by_epoch,
-                args.tolerance_sec,
-                decoded_time_source,
-                args.truth_mode,
+            decoded_packet_ids.append(decoded_packet_id)
+            decoded_timestamps_ms.append(decoded_timestamp_ms)
+            decoded_truth_epochs_ms.append(decoded_truth_epoch_ms)
+            decoded_time_sources.append(decoded_time_source)
+            record_infos.append(
+                (
+                    decoded_packet_id,
+                    decoded_timestamp_ms,
+                    decode_ok,
+                    crc_ok,
+                    decoded_at_ms,
+                    cache_epoch_ms,
+                    source_packet_id,
+                    decoded_truth_epoch_ms,
+                    truth_packet_id,
+                    rec.get("truth_ts"),
+                    rec.get("source"),
+                )
             )
+            if args.debug_one:
+                debug_beds.append(decoded_beds)
+            yield [decoded_beds.get(bed) if isinstance(decoded_beds.get(bed), dict) else None for bed in BED_IDS]
+
+    # Pass 2 (decoded side): pack decoded values into (records, beds, fields) arrays as pass 1
+    # reads them.
+    dec, dec_status = _pack_values(scan_records(), decoded_bed_values)
+    decoded_record_count = len(record_infos)
+    print(f"[INFO] Loaded decoded rows: {decoded_record_count}")
+    success = np.array(success_flags, dtype=bool)
+    decode_success_record_count = int(np.count_nonzero(success))
+    crc_fail_record_count = sum(1 for info in record_infos if not info[3])
+
+    truth_idx, deltas, matched_bys = pick_truths(
+        decoded_packet_ids,
+        decoded_timestamps_ms,
+        decoded_truth_epochs_ms,
+        decoded_time_sources,
+        truth_rows,
+        args.tolerance_sec,
+        args.truth_mode,
+    )
+    for rec_idx in range(decoded_record_count):
+        if truth_idx[rec_idx] < 0:
+            truth_missing_record_count += 1
+            continue
+        matched_by = matched_bys[rec_idx]
+        matched_by_counter[matched_by] += 1
+        if matched_by == "packet_id":
+            packet_id_join_success_count += 1
+        if deltas[rec_idx] is not None:
+            delta_t_values.append(deltas[rec_idx])
+
+    # Pass 2 (truth side): each distinct matched truth row is normalized once and gathered per
+    # record by index.
+    matched = truth_idx >= 0
+    used_truth, truth_pos = np.unique(truth_idx[matched], return_inverse=True)
+    packed_truth, packed_truth_status = _pack_values(
+        [[truth_bed_data(truth_rows[i], bed) for bed in BED_IDS] for i in used_truth.tolist()],
+        truth_bed_values,
+    )
+    truth = np.full(dec.shape, np.nan, dtype=np.float64)
+    truth_status = np.full(dec.shape, STATUS_TRUTH_MISSING, dtype=np.uint8)
+    truth[matched] = packed_truth[truth_pos]
+    truth_status[matched] = packed_truth_status[truth_pos]
+
+    # Pass 3: score every cell at once.
+    status, ok, abs_err, match, within = _score_cells(
+        dec, dec_status, truth, truth_status, eps_arr, lo_arr, hi_arr, has_range_arr, rounded_arr
+    )
+    ok_success = ok & success[:, None, None]
+
+    total_expected = status.size
+    missing_count = int(np.count_nonzero((status == STATUS_MISSING) | (status == STATUS_TRUTH_MISSING)))
+    invalid_count = int(np.count_nonzero(status == STATUS_INVALID))
+    evaluated_count = int(np.count_nonzero(ok))
+    matched_count = int(np.count_nonzero(match))
+    within_tol_matched_count = int(np.count_nonzero(within))
+    evaluated_on_success = int(np.count_nonzero(ok_success))
+    matched_on_success = int(np.count_nonzero(match & ok_success))
+    # Boolean indexing walks (record, bed, field) in C order, the order the errors used to be
+    # appended in; the results stay float64 arrays rather than lists of Python floats.
+    abs_errors = abs_err[ok]
+    abs_errors_on_success = abs_err[ok_success]
+    # Per-field counters as length-20 arrays. The abs-error sum is a cumulative sum down the
+    # (record, bed) axis, i.e. the same left-to-right float additions the old per-field lists
+    # were summed with, so the MAE is bit-for-bit the same.
+    pf_eval = np.count_nonzero(ok, axis=(0, 1))
+    pf_match = np.count_nonzero(match, axis=(0, 1))
+    pf_within = np.count_nonzero(within, axis=(0, 1))
+    pf_abs_sum = np.zeros(len(VITAL_ORDER), dtype=np.float64)
+    if decoded_record_count:
+        pf_abs_sum = np.cumsum(np.where(ok, abs_err, 0.0).reshape(-1, len(VITAL_ORDER)), axis=0)[-1]
+
+    dec_l, dec_ok_l = dec.tolist(), (dec_status == STATUS_OK).tolist()
+    truth_l, truth_ok_l = truth.tolist(), (truth_status == STATUS_OK).tolist()
+    status_l, ok_l, abs_l = status.tolist(), ok.tolist(), abs_err.tolist()
+    match_l, within_l = match.tolist(), within.tolist()
+
+    with closing(_RESULT_WRITERS[args.output_format](out_path)) as writer:
+        for rec_idx, (
+            decoded_packet_id,
+            decoded_timestamp_ms,
+            decode_ok,
+            crc_ok,
+            decoded_at_ms,
+            cache_epoch_ms,
+            source_packet_id,
+            truth_epoch_ms,
+            truth_packet_id,
+            truth_ts,
+            source,
+        ) in enumerate(record_infos):
+            matched_by = matched_bys[rec_idx]
+            delta_t = deltas[rec_idx]
+            nearest_truth = truth_rows[truth_idx[rec_idx]] if truth_idx[rec_idx] >= 0 else None
+            if nearest_truth is not None and args.debug_one and not debug_done:
+                print_debug_one(nearest_truth, debug_beds[rec_idx])
+                debug_done = True
+            # Record-level columns, identical for all 120 rows of this record.
+            truth_timestamp = nearest_truth.get("timestamp_text") if nearest_truth else None
+            joined_truth_packet_id = normalize_packet_id(nearest_truth.get("packet_id")) if nearest_truth else None
+
+            # Everything but bed/field and the per-cell values is the same for all 120 rows, and
+            # a record without a matched truth only varies in its decoded values. The one dict is
+            # updated in place per cell; the writers serialize or copy out a row before returning.
+            row = {
+                "truth_timestamp": truth_timestamp,
+                "delta_t_ms": delta_t,
+                "matched_by": matched_by,
+                "bed": None,
+                "field": None,
+                "decoded_at_ms": decoded_at_ms,
+                "timestamp_ms": decoded_timestamp_ms,
+                "packet_id": decoded_packet_id,
+                "cache_epoch_ms": cache_epoch_ms,
+                "source_packet_id": source_packet_id,
+                "truth_epoch_ms": truth_epoch_ms,
+                "truth_packet_id": truth_packet_id,
+                "truth_ts": truth_ts,
+                "source": source,
+                "joined_truth_packet_id": joined_truth_packet_id,
+                "decode_ok": decode_ok,
+                "crc_ok": crc_ok,
+                "decoded_value": None,
+                "truth_value": None,
+                "abs_error": None,
+                "match": False,
+                "within_tol_match": False,
+                "status": STATUS_NAMES[STATUS_TRUTH_MISSING],
+            }
             if nearest_truth is None:
-                truth_missing_record_count += 1
+                for j, bed in enumerate(BED_IDS):
+                    row["bed"] = bed
+                    dec_row, dec_ok_row = dec_l[rec_idx][j], dec_ok_l[rec_idx][j]
+                    for k, field in enumerate(VITAL_ORDER):
+                        row["field"] = field
+                        row["decoded_value"] = dec_row[k] if dec_ok_row[k] else None
+                        writer.write_row(row)
             else:
-                matched_by_counter[matched_by] += 1
-                if matched_by == "packet_id":
-                    packet_id_join_success_count += 1
-                if delta_t is not None:
-                    delta_t_values.append(delta_t)
-                if args.debug_one and not debug_done:
-                    print_debug_one(nearest_truth, decoded_beds)
-                    debug_done = True
-
-            for bed in BED_IDS:
-                bed_decoded = decoded_beds.get(bed, {}) if isinstance(decoded_beds.get(bed), dict) else {}
-                for field in VITAL_ORDER:
-                    total_expected += 1
-                    per_field[field]["count"] += 1
-
-                    dec_value, dec_status = normalize_number(extract_decoded_value(bed_decoded, field))
-                    truth_value = None
-                    truth_status = "ok"
-                    if nearest_truth is None:
-                        truth_status = "truth_missing"
-                    else:
-                        truth_value, truth_status = normalize_number(extract_truth_value(nearest_truth, bed, field))
-
-                    status = "ok"
-                    if truth_status != "ok":
-                        status = truth_status
-                    elif dec_status != "ok":
-                        status = dec_status
-
-                    match = within_tol_match = False
-                    abs_error = None
-
-                    if status != "ok":
-                        if status in {"missing", "truth_missing"}:
-                            missing_count += 1
-                        else:
-                            invalid_count += 1
-                    else:
-                        assert dec_value is not None and truth_value is not None
-                        range_cfg = vital_ranges.get(field)
-                        if isinstance(range_cfg, list) and len(range_cfg) == 2 and isinstance(range_cfg[0], (int, float)) and isinstance(range_cfg[1], (int, float)):
-                            if not (float(range_cfg[0]) <= dec_value <= float(range_cfg[1])):
-                                status = "invalid"
-                                invalid_count += 1
-
-                    if status == "ok":
-                        evaluated_count += 1
-                        per_field[field]["evaluated"] += 1
-                        if field in integer_fields and field not in {"TSKIN", "TRECT"}:
-                            match = round(dec_value) == round(truth_value)
-                        else:
-                            match = dec_value == truth_value
-
-                        eps = eps_map.get(field, 0.0)
-                        try:
-                            eps = float(eps)
-                        except (TypeError, ValueError):
-                            eps = 0.0
-                        within_tol_match = abs(dec_value - truth_value) <= eps
-                        abs_error = abs(dec_value - truth_value)
-                        abs_errors.append(abs_error)
-                        per_field[field]["abs_errors"].append(abs_error)
-                        if is_success_record:
-                            evaluated_on_success += 1
-                            abs_errors_on_success.append(abs_error)
-                        if match:
-                            matched_count += 1
-                            per_field[field]["matched"] += 1
-                            if is_success_record:
-                                matched_on_success += 1
-                        if within_tol_match:
-                            within_tol_matched_count += 1
-                            per_field[field]["within_tol_matched"] += 1
-
-                    row = {
-                        "truth_timestamp": nearest_truth.get("timestamp_text") if nearest_truth else None,
-                        "delta_t_ms": delta_t,
-                        "matched_by": matched_by,
-                        "bed": bed,
-                        "field": field,
-                        "decoded_at_ms": normalize_epoch_ms(rec.get("decoded_at_ms")),
-                        "timestamp_ms": decoded_timestamp_ms,
-                        "packet_id": decoded_packet_id,
-                        "cache_epoch_ms": normalize_epoch_ms(rec.get("cache_epoch_ms")),
-                        "source_packet_id": normalize_packet_id(rec.get("source_packet_id")),
-                        "truth_epoch_ms": normalize_epoch_ms(rec.get("truth_epoch_ms")),
-                        "truth_packet_id": normalize_packet_id(rec.get("truth_packet_id")),
-                        "truth_ts": rec.get("truth_ts"),
-                        "source": rec.get("source"),
-                        "joined_truth_packet_id": normalize_packet_id(nearest_truth.get("packet_id")) if nearest_truth else None,
-                        "decode_ok": decode_ok,
-                        "crc_ok": crc_ok,
-                        "decoded_value": dec_value,
-                        "truth_value": truth_value,
-                        "abs_error": abs_error,
-                        "match": match,
-                        "within_tol_match": within_tol_match,
-                        "status": status,
-                    }
-                    out_f.write(json.dumps(row, ensure_ascii=False) + "\n")
-
-            if rec_idx % 50 == 0:
-                print(f"[INFO] processed decoded records: {rec_idx}/{len(decoded_rows)}")
-
-    per_field_summary = {
-        f: {
-            "count": st["count"],
-            "evaluated": st["evaluated"],
-            "match_rate": (st["matched"] / st["evaluated"]) if st["evaluated"] else None,
-            "within_tol_match_rate": (st["within_tol_matched"] / st["evaluated"]) if st["evaluated"] else None,
-            "mae": safe_mean(st["abs_errors"]),
+                for j, bed in enumerate(BED_IDS):
+                    row["bed"] = bed
+                    dec_row, dec_ok_row = dec_l[rec_idx][j], dec_ok_l[rec_idx][j]
+                    truth_row, truth_ok_row = truth_l[rec_idx][j], truth_ok_l[rec_idx][j]
+                    abs_row, ok_row = abs_l[rec_idx][j], ok_l[rec_idx][j]
+                    match_row, within_row, status_row = match_l[rec_idx][j], within_l[rec_idx][j], status_l[rec_idx][j]
+                    for k, field in enumerate(VITAL_ORDER):
+                        row["field"] = field
+                        row["decoded_value"] = dec_row[k] if dec_ok_row[k] else None
+                        row["truth_value"] = truth_row[k] if truth_ok_row[k] else None
+                        row["abs_error"] = abs_row[k] if ok_row[k] else None
+                        row["match"] = match_row[k]
+                        row["within_tol_match"] = within_row[k]
+                        row["status"] = STATUS_NAMES[status_row[k]]
+                        writer.write_row(row)
+
+            if (rec_idx + 1) % 50 == 0:
+                print(f"[INFO] processed decoded records: {rec_idx + 1}/{decoded_record_count}")
+
+    per_field_summary = {}
+    for k, f in enumerate(VITAL_ORDER):
+        evaluated = int(pf_eval[k])
+        per_field_summary[f] = {
+            "count": decoded_record_count * len(BED_IDS),
+            "evaluated": evaluated,
+            "match_rate": (int(pf_match[k]) / evaluated) if evaluated else None,
+            "within_tol_match_rate": (int(pf_within[k]) / evaluated) if evaluated else None,
+            "mae": (float(pf_abs_sum[k]) / evaluated) if evaluated else None,
         }
-        for f, st in per_field.items()
-    }
 
     summary = {
         "decoded_records": decoded_record_count,
@@ -657,8 +1115,7 @@ def main() -> None:
         "per_field": per_field_summary,
     }
 
-    with summary_path.open("w", encoding="utf-8") as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    summary_path.write_bytes(cache_io.dumps_json(summary, pretty=True))
 
     print(f"[INFO] Detailed results written: {out_path}")
     print(f"[INFO] Summary written: {summary_path}")
@@ -2,15 +2,32 @@ from __future__ import annotations
 
 import argparse
 import logging
+import os
+import queue
 import random
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
 
-from hl7_sender import send_mllp_message
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - falls back to the random module
+    np = None
+
+from hl7_sender import MllpClient
 
 
 logger = logging.getLogger(__name__)
 
+# While the receiver is unreachable the pause between ticks doubles from the initial delay up
+# to the cap (never below --interval), and drops back to --interval after a successful send.
+RECONNECT_BACKOFF_INITIAL = 0.5
+RECONNECT_BACKOFF_MAX = 30.0
+# Ticks the producer thread may build ahead of the sender. MSH-7 is stamped when a tick is
+# sent (stamp_messages), so prefetched ticks never carry an old timestamp.
+PREFETCH_TICKS = 2
+
 VITAL_SPECS = [
     ("HR", "HeartRate", "bpm", 50.0, 180.0, 0),
     ("ART_S", "ArterialSystolic", "mmHg", 40.0, 140.0, 0),
@@ -35,25 +52,196 @@ VITAL_SPECS = [
 ]
 
 
-def build_message(bed: str, msg_id: int) -> str:
-    now = datetime.now().strftime("%Y%m%d%H%M%S")
-    header = (
-        f"MSH|^~\\&|GEN|ICU|MON|ICU|{now}||ORU^R01|MSG{msg_id:06d}|P|2.4\r"
-        "PID|1||12345||DOE^JOHN||19800101|M\r"
-        f"PV1|1|I|WARD^A^{bed}\r"
-        "OBR|1|||VITALS\r"
-    )
+# Invariant message pieces, built once; only timestamp, msg id, bed and values vary.
+_MSH_PREFIX = "MSH|^~\\&|GEN|ICU|MON|ICU|"
+_MSH_TYPE = "||ORU^R01|MSG"
+_MSH_SUFFIX_TO_PV1 = "|P|2.4\rPID|1||12345||DOE^JOHN||19800101|M\rPV1|1|I|WARD^A^"
+_OBR_SEGMENT = "\rOBR|1|||VITALS\r"
+# Struct-of-arrays view of VITAL_SPECS: parallel tuples indexed by position per message.
+_VITAL_CODES, _VITAL_LABELS, _VITAL_UNITS, _VITAL_MINS, _VITAL_MAXS, _VITAL_DECIMALS = (
+    tuple(column) for column in zip(*VITAL_SPECS)
+)
+_VITAL_INDICES = range(len(VITAL_SPECS))
+# Conversion per vital: "%d" for integer vitals (drawn as ints, and ~40% cheaper to format
+# than "%.0f"), fixed precision for the rest: "123" / "36.5" rather than the repr of a float.
+_VALUE_SPECS = tuple(f"%.{decimals}f" if decimals > 0 else "%d" for decimals in _VITAL_DECIMALS)
+
+
+def _format_literal(text: str) -> str:
+    return text.replace("%", "%%")
+
+
+# One OBX segment per vital with only its value left open, fixed at import.
+_OBX_TEMPLATES = tuple(
+    _format_literal(f"OBX|{i + 1}|NM|{_VITAL_CODES[i]}^{_VITAL_LABELS[i]}||")
+    + _VALUE_SPECS[i]
+    + _format_literal(f"|{_VITAL_UNITS[i]}|||N\r")
+    for i in _VITAL_INDICES
+)
+# The whole message as one printf-style template: bed is baked in (see _message_template),
+# leaving msg id then the vitals in VITAL_SPECS order, so a message is a single % operation
+# (about twice as fast as format()). It is bytes: the message is pure ASCII and goes straight
+# into the MLLP frame, unencoded. MSH-7 is a fixed-width placeholder overwritten in place
+# right before the send, since messages are built ahead of it.
+_MSH_TS_PLACEHOLDER = b"00000000000000"
+_MSH_TS_OFFSET = len(_MSH_PREFIX.encode("ascii"))
+_MSH_TS_END = _MSH_TS_OFFSET + len(_MSH_TS_PLACEHOLDER)
+_TEMPLATE_HEAD = _format_literal(_MSH_PREFIX).encode("ascii") + _MSH_TS_PLACEHOLDER
+_TEMPLATE_MSG_ID_TO_BED = (_format_literal(_MSH_TYPE) + "%06d" + _format_literal(_MSH_SUFFIX_TO_PV1)).encode("ascii")
+_TEMPLATE_TAIL = (_format_literal(_OBR_SEGMENT) + "".join(_OBX_TEMPLATES)).encode("ascii")
+
+if np is not None:
+    _rng = np.random.default_rng()
+    _IS_DECIMAL = np.array([decimals > 0 for decimals in _VITAL_DECIMALS])
+    _MINS = np.array(_VITAL_MINS, dtype=np.float64)
+    _MAXS = np.array(_VITAL_MAXS, dtype=np.float64)
+    # Integer vitals span one extra unit so flooring covers the inclusive randint() range.
+    _SPANS = np.where(_IS_DECIMAL, _MAXS - _MINS, _MAXS - _MINS + 1.0)
+    _IS_INTEGER = ~_IS_DECIMAL
+    _INTEGER_COLUMNS = np.flatnonzero(_IS_INTEGER)
+
+
+def seed_rng(seed: int | None = None, stream: int = 0) -> None:
+    """Reseed the vital RNGs; without a seed from OS entropy.
+
+    Processes given the same seed and different streams draw independent, reproducible
+    sequences (NumPy SeedSequence children), e.g. one generator process per ward.
+    """
+    global _rng
+    if np is not None:
+        _rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(stream + 1)[stream])
+    random.seed(None if seed is None else f"{seed}:{stream}")
+
+
+if np is not None and hasattr(os, "register_at_fork"):
+    # random reseeds itself in a forked child but NumPy does not, so children forked after
+    # import would otherwise all draw the parent's sequence.
+    os.register_at_fork(after_in_child=seed_rng)
+
+
+def draw_values(rows: int) -> list[list[float]]:
+    """Random vitals for `rows` beds, one list per bed in VITAL_SPECS order (integer vitals as int)."""
+    if np is None:
+        return [_draw_row() for _ in range(rows)]
+    # One [0, 1) draw for the whole tick, scaled per column; integer vitals are floored.
+    values = _rng.random((rows, len(_MINS)))
+    values *= _SPANS
+    values += _MINS
+    np.floor(values, out=values, where=_IS_INTEGER)
+    # Rounding in the scaling can land exactly on the exclusive bound.
+    np.minimum(values, _MAXS, out=values)
+    rows_out = values.astype(object)
+    rows_out[:, _INTEGER_COLUMNS] = values[:, _INTEGER_COLUMNS].astype(np.int64)
+    return rows_out.tolist()
+
+
+# Per-vital (is_decimal, low, high) for the pure-Python fallback, with integer bounds already
+# converted so a draw does no per-field decision work beyond one flag test. Integer highs are
+# exclusive: randrange(lo, hi + 1) is what randint(lo, hi) calls after validating its arguments.
+_FALLBACK_DRAWS = tuple(
+    (True, lo, hi) if decimals > 0 else (False, int(lo), int(hi) + 1)
+    for lo, hi, decimals in zip(_VITAL_MINS, _VITAL_MAXS, _VITAL_DECIMALS)
+)
+
+
+def _draw_row() -> list[float]:
+    uniform, randrange = random.uniform, random.randrange
+    return [uniform(lo, hi) if is_decimal else randrange(lo, hi) for is_decimal, lo, hi in _FALLBACK_DRAWS]
+
+
+_templates: dict[str, bytes] = {}
+
+
+def _message_template(bed: str) -> bytes:
+    template = _templates.get(bed)
+    if template is None:
+        template = _templates[bed] = b"".join(
+            [_TEMPLATE_HEAD, _TEMPLATE_MSG_ID_TO_BED, _format_literal(bed).encode("ascii"), _TEMPLATE_TAIL]
+        )
+    return template
+
+
+# MSH-7 has 1 s resolution, so the formatted timestamp is reused until the second changes.
+_timestamp_cache: list = [None, b""]
 
-    obx_segments: list[str] = []
-    for index, (code, label, unit, minimum, maximum, decimals) in enumerate(VITAL_SPECS, start=1):
-        if decimals > 0:
-            value = round(random.uniform(minimum, maximum), decimals)
-        else:
-            value = float(random.randint(int(minimum), int(maximum)))
-        value_text = str(value)
-        obx_segments.append(f"OBX|{index}|NM|{code}^{label}||{value_text}|{unit}|||N\r")
 
-    return header + "".join(obx_segments)
+def _msh_timestamp() -> bytes:
+    now_s = int(time.time())
+    if now_s != _timestamp_cache[0]:
+        _timestamp_cache[:] = [now_s, time.strftime("%Y%m%d%H%M%S", time.localtime(now_s)).encode("ascii")]
+    return _timestamp_cache[1]
+
+
+def _build_unstamped(bed: str, msg_id: int, values: Sequence[float]) -> bytearray:
+    return bytearray(_message_template(bed) % (msg_id, *values))
+
+
+def stamp_messages(messages: Sequence[bytearray]) -> None:
+    """Write the current time into MSH-7 of messages from _build_unstamped, in place."""
+    timestamp = _msh_timestamp()
+    for message in messages:
+        message[_MSH_TS_OFFSET:_MSH_TS_END] = timestamp
+
+
+def build_message(bed: str, msg_id: int, values: Sequence[float] | None = None) -> bytes:
+    """The ORU^R01 message for one bed as ASCII bytes, ready to be MLLP-framed."""
+    if values is None:
+        values = _draw_row()
+    message = _build_unstamped(bed, msg_id, values)
+    stamp_messages([message])
+    return bytes(message)
+
+
+def _produce_ticks(beds: Sequence[str], count: int, ticks: queue.Queue, stop: threading.Event) -> None:
+    """Build each tick's (bed, msg_id, unstamped message) list ahead of the sender; None marks the end."""
+    msg_id = 1
+    loop = 0
+    while count < 0 or loop < count:
+        tick = []
+        for bed, values in zip(beds, draw_values(len(beds))):
+            tick.append((bed, msg_id, _build_unstamped(bed, msg_id, values)))
+            msg_id += 1
+        while True:
+            if stop.is_set():
+                return
+            try:
+                ticks.put(tick, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        loop += 1
+    ticks.put(None)
+
+
+def parse_target(value: str) -> tuple[str, int]:
+    host, sep, port = value.rpartition(":")
+    if not sep or not host:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got: {value}")
+    try:
+        return host, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid port in target: {value}") from None
+
+
+def _log_results(tick: list[tuple[str, int, bytearray]], results: list[tuple[bool, str | None]], client: MllpClient) -> bool:
+    """Log one target's per-bed outcome; returns True when any send failed."""
+    failed = False
+    # Checked once per tick: the per-message success lines are the bulk of the logging.
+    log_sent = logger.isEnabledFor(logging.INFO)
+    for (bed, msg_id, _), (ok, _) in zip(tick, results):
+        if ok:
+            if log_sent:
+                logger.info("sent message_id=MSG%06d bed=%s", msg_id, bed)
+        else:
+            failed = True
+            logger.warning(
+                "send failed message_id=MSG%06d bed=%s (receiver not reachable at %s:%d)",
+                msg_id,
+                bed,
+                client.host,
+                client.port,
+            )
+    return failed
 
 
 def main() -> None:
@@ -62,29 +250,75 @@ def main() -> None:
     ap.add_argument("--port", type=int, default=2575)
     ap.add_argument("--interval", type=float, default=1.0)
     ap.add_argument("--count", type=int, default=-1, help="送信ループ回数(-1で無限)")
+    ap.add_argument(
+        "--target",
+        action="append",
+        type=parse_target,
+        metavar="HOST:PORT",
+        help="送信先 (複数指定可)。指定時は --host/--port の代わりに全送信先へ同じメッセージを並行送信",
+    )
+    ap.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="ログレベル")
+    ap.add_argument("--quiet", action="store_true", help="送信成功ログを出さない (--log-level WARNING と同じ。スループット計測用)")
+    ap.add_argument("--seed", type=int, help="乱数シード (未指定時はOSエントロピー)")
+    ap.add_argument("--stream", type=int, default=0, help="同一 --seed で複数プロセスを動かす際の独立ストリーム番号 (0以上)")
     args = ap.parse_args()
+    if args.stream < 0:
+        ap.error("--stream must be >= 0")
+    if args.seed is not None or args.stream:
+        seed_rng(args.seed, args.stream)
 
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    log_level = logging.WARNING if args.quiet else getattr(logging, args.log_level)
+    logging.basicConfig(level=log_level, format="%(asctime)s [%(levelname)s] %(message)s")
 
-    msg_id = 1
     beds = [f"BED{i:02d}" for i in range(1, 7)]
-    loop = 0
-    while args.count < 0 or loop < args.count:
-        for bed in beds:
-            ok = send_mllp_message(args.host, args.port, build_message(bed, msg_id))
-            if ok:
-                logger.info("sent message_id=MSG%06d bed=%s", msg_id, bed)
+    backoff = 0.0
+    # Messages are built on a producer thread, so the next tick is ready while this one waits
+    # for ACKs or sleeps.
+    ticks: queue.Queue = queue.Queue(maxsize=PREFETCH_TICKS)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce_ticks, args=(beds, args.count, ticks, stop), name="hl7-build", daemon=True)
+    producer.start()
+    # One kept-alive connection per receiver carries every bed's messages for the life of the
+    # process; MllpClient reconnects by itself when the receiver drops it.
+    clients = [MllpClient(host, port) for host, port in (args.target or [(args.host, args.port)])]
+    # With several receivers each client waits for its own ACKs on a pool thread.
+    send_pool = ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="mllp-send") if len(clients) > 1 else None
+    # Ticks are scheduled against a monotonic deadline, so send time does not stretch the period.
+    deadline = time.monotonic()
+    try:
+        while True:
+            tick = ticks.get()
+            if tick is None:
+                break
+            # All beds of the tick go out in one write per receiver; ACKs are read back in order.
+            messages = [message for _, _, message in tick]
+            # Stamped now rather than when built, so neither the prefetch queue nor a reconnect
+            # backoff delays a message behind its own timestamp.
+            stamp_messages(messages)
+            if send_pool is None:
+                all_results = [clients[0].send_batch_with_error(messages)]
             else:
-                logger.warning(
-                    "send failed message_id=MSG%06d bed=%s (receiver not reachable at %s:%d)",
-                    msg_id,
-                    bed,
-                    args.host,
-                    args.port,
-                )
-            msg_id += 1
-        loop += 1
-        time.sleep(args.interval)
+                all_results = list(send_pool.map(lambda client: client.send_batch_with_error(messages), clients))
+            tick_failed = False
+            for client, results in zip(clients, all_results):
+                tick_failed |= _log_results(tick, results, client)
+            now = time.monotonic()
+            if tick_failed:
+                backoff = min(max(backoff * 2, RECONNECT_BACKOFF_INITIAL), RECONNECT_BACKOFF_MAX)
+                deadline = now + max(args.interval, backoff)
+            else:
+                backoff = 0.0
+                deadline += args.interval
+                if deadline < now:
+                    # Fell behind (slow receiver, suspend): resume the cadence instead of bursting.
+                    deadline = now
+            time.sleep(max(0.0, deadline - now))
+    finally:
+        stop.set()
+        if send_pool is not None:
+            send_pool.shutdown()
+        for client in clients:
+            client.close()
 
 
 if __name__ == "__main__":